@@ -0,0 +1,25 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import yaml
+
+# Root conftest: puts the repo root on sys.path for plain `pytest`, and points src.config at a
+# copy of config.yaml whose data folder is temporary, since importing src.config creates the
+# data folders. Set before any test module imports src.
+
+_DATA_ROOT = Path(tempfile.mkdtemp(prefix="podcast-tests-"))
+
+with open(Path(__file__).resolve().parent / "config.yaml", "r") as f:
+    _cfg = yaml.safe_load(f) or {}
+_cfg["paths"]["data_root"] = str(_DATA_ROOT / "data")
+
+_config_path = _DATA_ROOT / "config.yaml"
+with open(_config_path, "w") as f:
+    yaml.safe_dump(_cfg, f, sort_keys=False)
+os.environ["PODCAST_TRANSCRIBER_CONFIG"] = str(_config_path)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_DATA_ROOT, ignore_errors=True)
@@ -0,0 +1,188 @@
+import json
+from pathlib import Path
+
+from harness import feed_server
+from src.audio import handle_file
+
+# Resume-correctness checks over a data folder after a soak. Everything published must end up
+# aligned (or quarantined, which is reported but allowed), every manifest must parse, every path a
+# manifest points at must exist and parse, and stored audio must be the full enclosure that was
+# served. Files no manifest points at are what killed runs left behind and are only counted.
+
+MANIFEST_PATH_KEYS = (
+    "audio_path", "transcript_path_full", "transcript_path_lite", "transcript_path_txt",
+    "diarization_path", "speaker_embeddings_path", "aligned_script_path", "readable_script_path",
+)
+# Paths a manifest must hold once it marks a stage complete
+REQUIRED_PATHS = {
+    "transcription_complete": ("transcript_path_full", "transcript_path_lite", "transcript_path_txt"),
+    "diarization_complete": ("diarization_path",),
+    "alignment_complete": ("aligned_script_path", "readable_script_path"),
+}
+STAGES = ("processing", "fingerprinting", "transcription", "diarization", "alignment")
+PROBLEMS = (
+    "missing_manifests", "unreadable_manifests", "incomplete", "missing_outputs",
+    "truncated_audio", "invalid_transcripts", "empty_scripts",
+)
+EXAMPLES = 10
+
+
+def data_folders(cfg):
+    """The folders src/config.py derives from a config dict"""
+    paths = cfg["paths"]
+    base = Path(paths["data_root"])
+    raw, processed = base / paths["raw_subfolder"], base / paths["processed_subfolder"]
+    return {
+        "manifests": raw / paths["manifest_subfolder"],
+        "raw_audio": raw / paths["raw_audio_subfolder"],
+        "intermediate_audio": raw / paths["wav_audio_subfolder"],
+        "transcripts": processed / paths["transcripts_subfolder"],
+        "diarizations": processed / paths["diarizations_subfolder"],
+        "aligned_scripts": processed / paths["aligned_scripts_subfolder"],
+    }
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _first_open_stage(metadata, fingerprinting):
+    if not metadata.get("audio_handle") and not metadata.get("wav_path"):
+        return "processing"
+    if fingerprinting and not metadata.get("fingerprint_complete"):
+        return "fingerprinting"
+    for stage in ("transcription", "diarization", "alignment"):
+        if not metadata.get(f"{stage}_complete"):
+            return stage
+    return None
+
+
+def verify_pipeline_output(cfg, server):
+    """
+    Returns (result, aligned_ids). result holds counts and example episode_ids per problem,
+    with ok=True if nothing is wrong.
+    """
+    folders = data_folders(cfg)
+    fingerprinting = bool((cfg.get("fingerprinting") or {}).get("enabled"))
+    expected = {
+        feed_server.episode_id_for(server.base_url, number): number
+        for number in range(1, server.published + 1)
+    }
+
+    problems = {key: [] for key in PROBLEMS}
+    open_stages = dict.fromkeys(STAGES, 0)
+    quarantined = []
+    referenced = set()
+    aligned = []
+
+    manifests = {path.stem: path for path in folders["manifests"].glob("*.json")}
+    problems["missing_manifests"] = [episode_id for episode_id in expected if episode_id not in manifests]
+
+    for episode_id, m_path in sorted(manifests.items()):
+        try:
+            metadata = _read_json(m_path)
+        except Exception:
+            problems["unreadable_manifests"].append(episode_id)
+            continue
+
+        for key in MANIFEST_PATH_KEYS:
+            if metadata.get(key):
+                referenced.add(Path(metadata[key]).resolve())
+        if metadata.get("audio_handle"):
+            referenced.add(handle_file(metadata["audio_handle"]).resolve())
+
+        missing = [
+            key for key in MANIFEST_PATH_KEYS
+            if metadata.get(key) and not Path(metadata[key]).exists()
+        ]
+        for flag, keys in REQUIRED_PATHS.items():
+            if metadata.get(flag):
+                missing += [key for key in keys if not metadata.get(key)]
+        if metadata.get("audio_handle") and not handle_file(metadata["audio_handle"]).exists():
+            missing.append("audio_handle")
+        for key in ("transcript_path_full", "diarization_path", "aligned_script_path", "speaker_embeddings_path"):
+            if metadata.get(key) and key not in missing:
+                try:
+                    _read_json(metadata[key])
+                except Exception:
+                    missing.append(key)
+        if missing:
+            problems["missing_outputs"].append(episode_id)
+
+        number = expected.get(episode_id)
+        if number and metadata.get("audio_path") and Path(metadata["audio_path"]).exists():
+            size = Path(metadata["audio_path"]).stat().st_size
+            if size != feed_server.episode_size_bytes(server.seed, number, server.mean_episode_s):
+                problems["truncated_audio"].append(episode_id)
+
+        if number and metadata.get("transcription_complete") and "transcript_path_full" not in missing:
+            duration = feed_server.episode_duration_s(server.seed, number, server.mean_episode_s)
+            if not _transcript_is_valid(_read_json(metadata["transcript_path_full"]), duration):
+                problems["invalid_transcripts"].append(episode_id)
+
+        if metadata.get("alignment_complete"):
+            aligned.append(episode_id)
+            if "aligned_script_path" not in missing and not _read_json(metadata["aligned_script_path"]):
+                problems["empty_scripts"].append(episode_id)
+            continue
+
+        stuck = [stage for stage, failure in (metadata.get("failures") or {}).items() if failure.get("quarantined")]
+        if stuck:
+            quarantined.append(episode_id)
+            continue
+
+        problems["incomplete"].append(episode_id)
+        open_stages[_first_open_stage(metadata, fingerprinting) or "alignment"] += 1
+
+    orphans, tmp_files = _unreferenced_files(folders, referenced)
+
+    result = {
+        "published": len(expected),
+        "manifests": len(manifests),
+        "aligned": len(aligned),
+        "quarantined": len(quarantined),
+        "quarantined_examples": quarantined[:EXAMPLES],
+        "incomplete_by_stage": {stage: count for stage, count in open_stages.items() if count},
+        "orphan_files": orphans,
+        "tmp_files": tmp_files,
+    }
+    for key, episode_ids in problems.items():
+        result[key] = len(episode_ids)
+        if episode_ids:
+            result[f"{key}_examples"] = episode_ids[:EXAMPLES]
+    result["ok"] = not any(problems.values())
+    return result, aligned
+
+
+def _transcript_is_valid(transcript, duration):
+    """Chunks in order, inside the episode, each with text"""
+    chunks = transcript.get("chunks") or []
+    previous_start = -1.0
+    for chunk in chunks:
+        start, end = chunk["timestamp"]
+        if start < previous_start or start < 0 or end > duration + 1 or end < start or not chunk.get("text"):
+            return False
+        previous_start = start
+    return bool(chunks)
+
+
+def _unreferenced_files(folders, referenced):
+    orphans, tmp_files = {}, 0
+    for name, folder in folders.items():
+        if name == "manifests":
+            tmp_files += len(list(folder.glob("*.tmp")))
+            continue
+        if not folder.exists():
+            continue
+
+        count = 0
+        for path in folder.iterdir():
+            if path.suffix == ".tmp":
+                tmp_files += 1
+            elif path.is_file() and path.resolve() not in referenced:
+                count += 1
+        if count:
+            orphans[name] = count
+
+    return orphans, tmp_files
@@ -0,0 +1,195 @@
+import json
+import os
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Deterministic stand-ins for faster-whisper and pyannote, so the pipeline can run for hours on
+# any machine. They return the same shapes the real models do (what transform.transcribe_segments
+# and transform.run_pyannote read) and derive everything from the audio they are given, so the
+# same input always gives the same transcript. Latency, memory and failures are configurable:
+#   latency_s_per_audio_min  sleep per minute of input audio
+#   load_s                   sleep when the model is loaded (what worker recycling costs)
+#   ballast_mb               memory held for the model's lifetime (weights)
+#   leak_mb_per_episode      memory kept after every call, to exercise the supervisor's recycling
+#   error_rate               share of calls that raise
+# Settings come from the PODCAST_HARNESS_MODELS environment variable (JSON), which spawned
+# worker processes inherit.
+
+SETTINGS_ENV = "PODCAST_HARNESS_MODELS"
+SAMPLE_RATE = 16000
+SEGMENT_S = 4.0
+WORDS = (
+    "the symbolic order imaginary real subject desire lack object drive enjoyment other "
+    "signifier fantasy ideology capital labour history theory cinema politics freedom"
+).split()
+EMBEDDING_DIM = 256
+
+DEFAULT_SETTINGS = {
+    "whisper": {"latency_s_per_audio_min": 0.5, "load_s": 2.0, "ballast_mb": 300, "leak_mb_per_episode": 0, "error_rate": 0.0},
+    "pyannote": {"latency_s_per_audio_min": 0.3, "load_s": 2.0, "ballast_mb": 200, "leak_mb_per_episode": 0, "error_rate": 0.0},
+}
+
+
+def load_settings():
+    overrides = json.loads(os.environ.get(SETTINGS_ENV) or "{}")
+    return {model: {**defaults, **(overrides.get(model) or {})} for model, defaults in DEFAULT_SETTINGS.items()}
+
+
+def _audio_seed(samples):
+    """Stable across runs and formats: quantised samples survive WAV/FLAC round trips unchanged"""
+    return zlib.crc32(np.round(np.asarray(samples[:SAMPLE_RATE * 30]) * 1000).astype(np.int16).tobytes())
+
+
+class _FakeModel:
+    def __init__(self, settings):
+        self.settings = settings
+        self._leaked = []
+        self._rng = random.Random()
+
+        time.sleep(settings["load_s"])
+        # Touch every page so the ballast shows up in RSS, like loaded weights
+        self._ballast = np.ones(int(settings["ballast_mb"] * 2**20) // 8)
+
+    def _simulate_work(self, samples):
+        if self._rng.random() < self.settings["error_rate"]:
+            raise RuntimeError(f"Injected {type(self).__name__} failure")
+
+        time.sleep(self.settings["latency_s_per_audio_min"] * len(samples) / SAMPLE_RATE / 60)
+        if self.settings["leak_mb_per_episode"]:
+            self._leaked.append(np.ones(int(self.settings["leak_mb_per_episode"] * 2**20) // 8))
+
+
+### Whisper ###
+
+@dataclass
+class Word:
+    start: float
+    end: float
+    word: str
+    probability: float = 0.9
+
+
+@dataclass
+class Segment:
+    start: float
+    end: float
+    text: str
+    words: list = field(default_factory=list)
+
+
+@dataclass
+class TranscriptionInfo:
+    language: str
+    duration: float
+
+
+class FakeWhisperModel(_FakeModel):
+    """model.transcribe(audio, **options) -> (segments, info), one segment per 4 s of non-silent audio"""
+
+    def transcribe(self, audio, **options):
+        samples = np.asarray(audio, dtype=np.float32)
+        self._simulate_work(samples)
+
+        duration = len(samples) / SAMPLE_RATE
+        segment_len = int(SEGMENT_S * SAMPLE_RATE)
+        segments = []
+
+        for start_idx in range(0, len(samples), segment_len):
+            block = samples[start_idx:start_idx + segment_len]
+            # Stands in for the VAD filter
+            if len(block) < SAMPLE_RATE // 4 or np.sqrt(np.mean(block ** 2)) < 0.01:
+                continue
+
+            rng = random.Random(_audio_seed(block))
+            start, end = start_idx / SAMPLE_RATE, (start_idx + len(block)) / SAMPLE_RATE
+            tokens = [rng.choice(WORDS) for _ in range(rng.randint(4, 9))]
+            step = (end - start) / len(tokens)
+            words = [
+                Word(round(start + i * step, 2), round(start + (i + 1) * step, 2), f" {token}")
+                for i, token in enumerate(tokens)
+            ]
+            segments.append(Segment(start, end, " " + " ".join(tokens), words))
+
+        # Real segments are a lazy generator
+        return iter(segments), TranscriptionInfo("en", duration)
+
+
+def init_fake_whisper(model_size=None, num_workers=1):
+    return FakeWhisperModel(load_settings()["whisper"])
+
+
+### pyannote ###
+
+@dataclass
+class Turn:
+    start: float
+    end: float
+
+
+class Annotation:
+    def __init__(self, tracks):
+        self._tracks = tracks
+
+    def itertracks(self, yield_label=False):
+        for index, (turn, label) in enumerate(self._tracks):
+            yield (turn, f"T{index}", label) if yield_label else (turn, f"T{index}")
+
+    def labels(self):
+        return sorted({label for _, label in self._tracks})
+
+
+@dataclass
+class DiarizeOutput:
+    speaker_diarization: Annotation
+    speaker_embeddings: np.ndarray
+
+
+class FakePyannotePipeline(_FakeModel):
+    """
+    pipeline({"waveform", "sample_rate"}) -> output with .speaker_diarization and .speaker_embeddings.
+    Turns alternate between two or three speakers. Each speaker index has a fixed 'voice' vector,
+    so embeddings of the same index match across episodes the way a recurring host would.
+    """
+
+    def __call__(self, audio_in_memory):
+        samples = np.asarray(audio_in_memory["waveform"][0], dtype=np.float32)
+        self._simulate_work(samples)
+
+        seed = _audio_seed(samples)
+        rng = random.Random(seed)
+        speaker_count = 2 + seed % 2
+        duration = len(samples) / audio_in_memory["sample_rate"]
+
+        tracks = []
+        position, speaker = 0.0, 0
+        while position < duration:
+            end = min(position + rng.uniform(3, 12), duration)
+            tracks.append((Turn(round(position, 3), round(end, 3)), f"SPEAKER_{speaker:02d}"))
+            position = end + rng.uniform(0.2, 1.0)
+            speaker = (speaker + rng.randint(1, speaker_count - 1)) % speaker_count
+
+        annotation = Annotation(tracks)
+        noise = np.random.default_rng(seed)
+        embeddings = np.array([
+            np.random.default_rng(1000 + int(label[-2:])).normal(size=EMBEDDING_DIM) + noise.normal(0, 0.2, size=EMBEDDING_DIM)
+            for label in annotation.labels()
+        ])
+        return DiarizeOutput(annotation, embeddings)
+
+
+def init_fake_pyannote():
+    return FakePyannotePipeline(load_settings()["pyannote"])
+
+
+### Installation ###
+
+def install():
+    """Replaces the model loaders in src.transform, call before the pipeline loads any model"""
+    from src import transform
+
+    transform.init_faster_whisper = init_fake_whisper
+    transform.init_pyannote = init_fake_pyannote
@@ -0,0 +1,242 @@
+import datetime
+import email.utils
+import hashlib
+import io
+import random
+import threading
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# A local stand-in for the podcast host: an RSS feed whose enclosures are generated on request.
+# Episodes are deterministic functions of (seed, number), so the harness can recompute the exact
+# bytes it served when checking what the pipeline stored. Every episode opens with the same
+# jingle and every third one carries the same ad read, which gives fingerprinting real repeats.
+# Enclosures are 16 kHz mono WAV: there is no MP3 encoder here, and ffmpeg probes the content
+# rather than trusting the .mp3 name the pipeline saves it under.
+
+SAMPLE_RATE = 16000
+WAV_HEADER_BYTES = 44
+JINGLE_S = 12.0                 # Longer than the default fingerprinting min_segment_s (8 s)
+AD_S = 12.0
+
+
+### Synthetic audio ###
+
+def episode_duration_s(seed, number, mean_s):
+    """Episode lengths vary by +-20% around mean_s"""
+    rng = random.Random(f"{seed}:{number}:duration")
+    return round(mean_s * rng.uniform(0.8, 1.2), 2)
+
+
+def episode_size_bytes(seed, number, mean_s):
+    return WAV_HEADER_BYTES + 2 * int(episode_duration_s(seed, number, mean_s) * SAMPLE_RATE)
+
+
+def _tone_sequence(rng, duration_s):
+    """Stepped tones, used for the jingle and ad that recur across episodes"""
+    t = np.arange(int(duration_s * SAMPLE_RATE)) / SAMPLE_RATE
+    step = (t * 4).astype(int)
+    notes = rng.uniform(300, 1500, size=step.max() + 1)
+    return 0.3 * np.sin(2 * np.pi * notes[step] * t) + 0.1 * np.sin(2 * np.pi * 2 * notes[step] * t)
+
+
+def _speech_like(rng, duration_s):
+    """Alternating 'voices': harmonic stacks at two pitches, syllable-modulated, with pauses between turns"""
+    out = np.zeros(int(duration_s * SAMPLE_RATE), dtype=np.float64)
+    position = 0
+    voice = 0
+
+    while position < len(out):
+        turn = int(rng.uniform(3, 12) * SAMPLE_RATE)
+        pause = int(rng.uniform(0.3, 1.2) * SAMPLE_RATE)
+        end = min(position + turn, len(out))
+
+        t = np.arange(end - position) / SAMPLE_RATE
+        f0 = (120, 210)[voice] * (1 + 0.03 * np.sin(2 * np.pi * 0.7 * t))
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        carrier = sum(np.sin(k * phase) / k for k in range(1, 6))
+        syllables = np.abs(np.sin(2 * np.pi * rng.uniform(3, 5) * t))
+        out[position:end] = 0.2 * carrier * syllables
+
+        position = end + pause
+        voice = 1 - voice
+
+    return out + rng.normal(0, 0.003, size=len(out))
+
+
+def generate_episode(seed, number, mean_s):
+    """Returns the episode's int16 samples"""
+    duration_s = episode_duration_s(seed, number, mean_s)
+    total = int(duration_s * SAMPLE_RATE)
+
+    parts = [_tone_sequence(np.random.default_rng([seed, 0]), JINGLE_S)]
+    body = _speech_like(np.random.default_rng([seed, number]), max(duration_s - JINGLE_S, 1.0))
+    if number % 3 == 0:
+        split = len(body) * 2 // 5
+        parts += [body[:split], _tone_sequence(np.random.default_rng([seed, 1]), AD_S), body[split:]]
+    else:
+        parts.append(body)
+
+    samples = np.concatenate(parts)[:total]
+    samples = np.pad(samples, (0, total - len(samples)))
+    return (np.clip(samples, -1, 1) * 32767).astype("<i2")
+
+
+def encode_wav(samples):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+### Feed ###
+
+def episode_url(base_url, number):
+    return f"{base_url}/episodes/{number}.wav"
+
+
+def episode_id_for(base_url, number):
+    """Mirrors the id extract.get_ep_metadata derives from the enclosure URL"""
+    return hashlib.md5(episode_url(base_url, number).encode()).hexdigest()[:12]
+
+
+def build_rss(base_url, published, seed, mean_s):
+    """Newest first, like a real feed"""
+    first_date = datetime.datetime(2020, 1, 6, 9, 0, tzinfo=datetime.timezone.utc)
+    items = []
+    for number in range(published, 0, -1):
+        pub_date = email.utils.format_datetime(first_date + datetime.timedelta(days=7 * (number - 1)))
+        items.append(
+            "<item>"
+            f"<title>Synthetic Episode {number}</title>"
+            f"<pubDate>{pub_date}</pubDate>"
+            f"<description><![CDATA[<p>Generated episode {number} for the soak harness.</p>]]></description>"
+            f'<enclosure url="{episode_url(base_url, number)}" '
+            f'length="{episode_size_bytes(seed, number, mean_s)}" type="audio/wav"/>'
+            "</item>"
+        )
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0"><channel>'
+        "<title>Synthetic Feed</title>"
+        f"<link>{base_url}</link>"
+        f"{''.join(items)}"
+        "</channel></rss>"
+    )
+
+
+### Server ###
+
+class FeedServer:
+    """
+    Serves /feed.xml and /episodes/<n>.wav from a background thread. Only the first `published`
+    episodes are listed, so the soak can release new ones between pipeline runs.
+    error_rate answers that share of enclosure requests with a 503; truncate_rate sends the full
+    Content-Length but closes the connection halfway through the body.
+    """
+
+    def __init__(self, episodes, mean_episode_s, seed=0, port=0, error_rate=0.0, truncate_rate=0.0):
+        self.episodes = episodes
+        self.mean_episode_s = mean_episode_s
+        self.seed = seed
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.published = 0
+        self.stats = {"feed_requests": 0, "audio_requests": 0, "bytes_sent": 0, "errors_injected": 0, "truncations_injected": 0}
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def feed_url(self):
+        return f"{self.base_url}/feed.xml"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="feed-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def publish(self, count):
+        self.published = min(self.published + count, self.episodes)
+        return self.published
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _roll(self, rate):
+        with self._lock:
+            return rate > 0 and self._rng.random() < rate
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/feed.xml":
+                    server._count("feed_requests")
+                    body = build_rss(server.base_url, server.published, server.seed, server.mean_episode_s).encode()
+                    self._send(200, "application/rss+xml", body)
+                    return
+
+                number = self._episode_number()
+                if number is None:
+                    self._send(404, "text/plain", b"not found")
+                    return
+
+                server._count("audio_requests")
+                if server._roll(server.error_rate):
+                    server._count("errors_injected")
+                    self._send(503, "text/plain", b"injected failure")
+                    return
+
+                body = encode_wav(generate_episode(server.seed, number, server.mean_episode_s))
+                if server._roll(server.truncate_rate):
+                    server._count("truncations_injected")
+                    self._send(200, "audio/wav", body, send_bytes=len(body) // 2)
+                    return
+
+                self._send(200, "audio/wav", body)
+
+            def _episode_number(self):
+                if not (self.path.startswith("/episodes/") and self.path.endswith(".wav")):
+                    return None
+                try:
+                    number = int(self.path[len("/episodes/"):-len(".wav")])
+                except ValueError:
+                    return None
+                return number if 1 <= number <= server.published else None
+
+            def _send(self, status, content_type, body, send_bytes=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body[:send_bytes] if send_bytes is not None else body)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                server._count("bytes_sent", len(body) if send_bytes is None else send_bytes)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
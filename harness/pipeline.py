@@ -0,0 +1,14 @@
+import sys
+
+from harness import fake_models
+
+# Entry point for one pipeline run with the fake models: python -m harness.pipeline
+# The models are swapped at import time rather than under __main__, because spawned worker
+# processes re-import this module (as __mp_main__) and must load the fakes too.
+fake_models.install()
+
+import main
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main.run_pipeline() else 1)
@@ -0,0 +1,482 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import psutil
+import yaml
+
+from harness import checks, fake_models
+from harness.feed_server import FeedServer, JINGLE_S, episode_duration_s, episode_id_for
+
+# Offline soak test: python -m harness.soak --hours 6 --episodes 3000
+# Serves a synthetic feed locally and runs the pipeline (python -m harness.pipeline, fake models)
+# over and over the way cron would, releasing new episodes each cycle. Cycles are killed at random
+# with SIGKILL across the whole process tree, a stand-in for OOM kills and power loss. Memory and
+# file descriptors of the pipeline tree are sampled throughout. Once the time is up, a few clean
+# drain cycles let the backlog settle and the data folder is checked for resume correctness.
+# Writes soak_report.json to the work folder and prints a summary.
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CONFIG_ENV = "PODCAST_TRANSCRIBER_CONFIG"
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+### Setup ###
+
+def write_config(workdir, feed_url, args):
+    """The repo's config.yaml with the data folder, feed and soak settings swapped in"""
+    with open(REPO_ROOT / "config.yaml", "r") as f:
+        cfg = yaml.safe_load(f) or {}
+
+    cfg["rss_url"] = feed_url
+    cfg["max_episodes"] = None
+    cfg["paths"]["data_root"] = str(workdir / "data")
+    cfg["logging"] = {"level": "INFO", "format": "json"}
+    cfg["audio"] = {**(cfg.get("audio") or {}), "intermediate_format": args.audio_format}
+    # The shared jingle has to be long enough to count as a repeat, whatever config.yaml says
+    fingerprinting = cfg.get("fingerprinting") or {}
+    cfg["fingerprinting"] = {
+        **fingerprinting,
+        "enabled": args.fingerprinting,
+        "min_segment_s": min(fingerprinting.get("min_segment_s", 8), JINGLE_S - 2),
+    }
+    cfg["speakers"] = {**(cfg.get("speakers") or {}), "enabled": args.speakers}
+    cfg["supervisor"] = {
+        **(cfg.get("supervisor") or {}),
+        "max_episodes_per_worker": args.max_episodes_per_worker,
+        "recycle_rss_mb": args.worker_max_rss_mb * 0.8,
+        "max_rss_mb": args.worker_max_rss_mb,
+        "sample_interval_s": 1,
+    }
+    # Short backoff so injected failures are retried within the soak
+    cfg["retries"] = {
+        **(cfg.get("retries") or {}),
+        "base_delay_s": args.retry_delay_s,
+        "max_delay_s": args.retry_delay_s * 16,
+    }
+
+    config_path = workdir / "config.yaml"
+    with open(config_path, "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    return config_path, cfg
+
+
+def model_settings(args, error_rate):
+    shared = {"load_s": args.model_load_s, "leak_mb_per_episode": args.leak_mb, "error_rate": error_rate}
+    return {
+        "whisper": {**shared, "latency_s_per_audio_min": args.whisper_latency, "ballast_mb": args.whisper_ballast_mb},
+        "pyannote": {**shared, "latency_s_per_audio_min": args.pyannote_latency, "ballast_mb": args.pyannote_ballast_mb},
+    }
+
+
+### Process sampling ###
+
+def _fd_count(process):
+    # num_handles is the Windows equivalent
+    return process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+
+
+def sample_process(process):
+    try:
+        return process.memory_info().rss / 2**20, _fd_count(process)
+    except psutil.Error:
+        return None, None
+
+
+def sample_tree(pid):
+    """(parent RSS MB, parent FDs, tree RSS MB, tree FDs, process count) for the pipeline and its children"""
+    try:
+        parent = psutil.Process(pid)
+        processes = [parent] + parent.children(recursive=True)
+    except psutil.Error:
+        return None
+
+    parent_rss, parent_fds = sample_process(parent)
+    if parent_rss is None:
+        return None
+
+    tree_rss, tree_fds = 0.0, 0
+    for process in processes:
+        rss, fds = sample_process(process)
+        if rss is not None:
+            tree_rss += rss
+            tree_fds += fds
+    return round(parent_rss), parent_fds, round(tree_rss), tree_fds, len(processes)
+
+
+def kill_tree(pid):
+    """SIGKILL the pipeline and every child at once, nothing gets to clean up"""
+    try:
+        parent = psutil.Process(pid)
+        processes = [parent] + parent.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return
+
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=30)
+
+
+### Cycles ###
+
+def run_cycle(number, env, log_path, crash_after_s, timeout_s, sample_interval_s, soak_started, samples):
+    """Runs the pipeline once, killing it after crash_after_s if set. Appends resource samples."""
+    started = time.monotonic()
+    outcome = "finished"
+
+    with open(log_path, "w", encoding="utf-8") as log_file:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "harness.pipeline"],
+            cwd=REPO_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT
+        )
+
+        while True:
+            try:
+                process.wait(timeout=sample_interval_s)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            elapsed = time.monotonic() - started
+            sample = sample_tree(process.pid)
+            if sample:
+                samples.append([round(time.monotonic() - soak_started, 1), number, *sample])
+
+            if crash_after_s is not None and elapsed >= crash_after_s:
+                kill_tree(process.pid)
+                outcome = "killed"
+            elif elapsed >= timeout_s:
+                kill_tree(process.pid)
+                outcome = "hung"
+
+        process.wait()
+
+    return {
+        "cycle": number,
+        "outcome": outcome if outcome != "finished" or process.returncode == 0 else f"exit {process.returncode}",
+        "duration_s": round(time.monotonic() - started, 1),
+        "crash_after_s": crash_after_s,
+    }
+
+
+def count_aligned(manifest_folder):
+    aligned = 0
+    for m_path in manifest_folder.glob("*.json"):
+        try:
+            with open(m_path, "r", encoding="utf-8") as f:
+                aligned += bool(json.load(f).get("alignment_complete"))
+        except Exception:
+            pass
+    return aligned
+
+
+### Log analysis ###
+
+def read_cycle_log(log_path, cycle):
+    """Episode-tagged JSON records from one run, anything else (tracebacks, ffmpeg noise) is skipped"""
+    records = []
+    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("episode_id") and entry.get("stage"):
+                entry["cycle"] = cycle
+                records.append(entry)
+    return records
+
+
+def stage_spans(records):
+    """
+    One span per (cycle, stage, episode): first record to the last manifest save. Spans with an
+    error, or a failure recorded by src.failures, are marked failed and left out of the latencies.
+    """
+    spans = {}
+    for entry in records:
+        key = (entry["cycle"], entry["stage"], entry["episode_id"])
+        timestamp = datetime.datetime.fromisoformat(entry["timestamp"])
+        span = spans.setdefault(key, {"start": timestamp, "done": None, "failed": False})
+
+        if entry["message"].startswith("Saved manifest to"):
+            span["done"] = timestamp
+        if entry["level"] in ("ERROR", "CRITICAL") or entry["logger"] == "src.failures":
+            span["failed"] = True
+    return spans
+
+
+def latency_summary(spans):
+    durations = defaultdict(list)
+    for (_, stage, _), span in spans.items():
+        if span["done"] and not span["failed"]:
+            durations[stage].append((span["done"] - span["start"]).total_seconds())
+
+    summary = {}
+    for stage, values in durations.items():
+        summary[stage] = {"count": len(values), "max": round(max(values), 2)}
+        for percentile, value in zip(LATENCY_PERCENTILES, np.percentile(values, LATENCY_PERCENTILES)):
+            summary[stage][f"p{percentile}"] = round(float(value), 2)
+    return summary
+
+
+def rework_summary(spans):
+    """Episodes a stage worked on in more than one run, i.e. work repeated after a crash or failure"""
+    cycles = defaultdict(set)
+    for cycle, stage, episode_id in spans:
+        cycles[(stage, episode_id)].add(cycle)
+
+    rework = defaultdict(int)
+    for (stage, _), seen in cycles.items():
+        if len(seen) > 1:
+            rework[stage] += 1
+    return dict(rework)
+
+
+### Resource growth ###
+
+def slope_per_hour(times_s, values):
+    if len(values) < 3 or max(times_s) - min(times_s) <= 0:
+        return None
+    return round(float(np.polyfit(np.array(times_s) / 3600, values, 1)[0]), 2)
+
+
+def resource_summary(samples, harness_samples):
+    """
+    Pipeline runs are restarted every cycle, so growth is measured within each run (slope over the
+    run's own samples) and as the trend of per-run peaks. The harness process itself runs the
+    whole soak, so its slope covers the feed server.
+    """
+    by_cycle = defaultdict(list)
+    for sample in samples:
+        by_cycle[sample[1]].append(sample)
+
+    cycles = []
+    for cycle, rows in sorted(by_cycle.items()):
+        times = [row[0] for row in rows]
+        cycles.append({
+            "cycle": cycle,
+            "peak_parent_rss_mb": max(row[2] for row in rows),
+            "peak_parent_fds": max(row[3] for row in rows),
+            "peak_tree_rss_mb": max(row[4] for row in rows),
+            "peak_tree_fds": max(row[5] for row in rows),
+            "peak_processes": max(row[6] for row in rows),
+            "parent_rss_mb_per_hour": slope_per_hour(times, [row[2] for row in rows]) if len(rows) >= 10 else None,
+            "parent_fds_per_hour": slope_per_hour(times, [row[3] for row in rows]) if len(rows) >= 10 else None,
+        })
+
+    def worst(key):
+        values = [cycle[key] for cycle in cycles if cycle[key] is not None]
+        return max(values) if values else None
+
+    return {
+        "peak_tree_rss_mb": worst("peak_tree_rss_mb"),
+        "peak_tree_fds": worst("peak_tree_fds"),
+        "max_in_run_parent_rss_mb_per_hour": worst("parent_rss_mb_per_hour"),
+        "max_in_run_parent_fds_per_hour": worst("parent_fds_per_hour"),
+        "parent_peak_fds_per_run_trend": (
+            round(float(np.polyfit(range(len(cycles)), [c["peak_parent_fds"] for c in cycles], 1)[0]), 3)
+            if len(cycles) >= 3 else None
+        ),
+        "harness_rss_mb_per_hour": slope_per_hour([s[0] for s in harness_samples], [s[1] for s in harness_samples]),
+        "harness_fds_per_hour": slope_per_hour([s[0] for s in harness_samples], [s[2] for s in harness_samples]),
+        "cycles": cycles,
+    }
+
+
+### Soak ###
+
+def run_soak(args):
+    workdir = Path(args.workdir).resolve()
+    (workdir / "logs").mkdir(parents=True, exist_ok=True)
+    rng = random.Random(args.seed)
+
+    server = FeedServer(
+        args.episodes, args.episode_seconds, seed=args.seed, port=args.port,
+        error_rate=args.http_error_rate, truncate_rate=args.http_truncate_rate
+    )
+    server.start()
+    config_path, cfg = write_config(workdir, server.feed_url, args)
+    manifest_folder = checks.data_folders(cfg)["manifests"]
+    env = {**os.environ, CONFIG_ENV: str(config_path), fake_models.SETTINGS_ENV: json.dumps(model_settings(args, args.model_error_rate))}
+    clean_env = {**env, fake_models.SETTINGS_ENV: json.dumps(model_settings(args, 0.0))}
+
+    this_process = psutil.Process()
+    soak_started = time.monotonic()
+    deadline = soak_started + args.hours * 3600
+    aligned_before = count_aligned(manifest_folder)
+    samples, harness_samples, cycles, spans = [], [], [], {}
+    print(f"Soak: feed at {server.feed_url}, data in {workdir / 'data'}, {args.hours} h")
+
+    def cycle(cycle_env, crash_after_s):
+        number = len(cycles) + 1
+        log_path = workdir / "logs" / f"cycle_{number:04d}.log"
+        result = run_cycle(
+            number, cycle_env, log_path, crash_after_s, args.cycle_timeout_s,
+            args.sample_interval_s, soak_started, samples
+        )
+        result["published"] = server.published
+        result["aligned"] = count_aligned(manifest_folder)
+        cycles.append(result)
+        spans.update(stage_spans(read_cycle_log(log_path, number)))
+
+        rss, fds = sample_process(this_process)
+        harness_samples.append([round(time.monotonic() - soak_started, 1), round(rss), fds])
+        print(
+            f"cycle {number:>4}  {result['outcome']:<9} {result['duration_s']:>8.1f}s  "
+            f"published={result['published']}  aligned={result['aligned']}"
+        )
+        return result
+
+    try:
+        while time.monotonic() < deadline:
+            server.publish(args.publish_per_cycle)
+            crash_after_s = None
+            if rng.random() < args.crash_rate:
+                crash_after_s = round(rng.uniform(args.crash_min_s, args.crash_max_s), 1)
+            cycle(env, crash_after_s)
+            time.sleep(args.pause_s)
+
+        # Drain: no crashes and no injected faults until everything published is aligned or
+        # quarantined. Waiting out the longest backoff first makes every failed stage eligible again.
+        server.error_rate = server.truncate_rate = 0.0
+        verification, aligned_ids = checks.verify_pipeline_output(cfg, server)
+        for _ in range(args.drain_cycles):
+            if not verification["incomplete"] and not verification["missing_manifests"]:
+                break
+            time.sleep(cfg["retries"]["max_delay_s"])
+            cycle(clean_env, None)
+            verification, aligned_ids = checks.verify_pipeline_output(cfg, server)
+    finally:
+        server.stop()
+
+    elapsed_h = (time.monotonic() - soak_started) / 3600
+    episode_numbers = {
+        episode_id_for(server.base_url, number): number
+        for number in range(1, server.published + 1)
+    }
+    aligned_now = len(aligned_ids)
+    audio_hours = sum(
+        episode_duration_s(args.seed, episode_numbers[episode_id], args.episode_seconds)
+        for episode_id in aligned_ids if episode_id in episode_numbers
+    ) / 3600
+    report = {
+        "settings": vars(args),
+        "elapsed_h": round(elapsed_h, 3),
+        "runs": len(cycles),
+        "crashes_injected": sum(c["outcome"] == "killed" for c in cycles),
+        "hung_runs": sum(c["outcome"] == "hung" for c in cycles),
+        "failed_runs": sum(c["outcome"].startswith("exit") for c in cycles),
+        "throughput": {
+            "episodes_aligned": aligned_now - aligned_before,
+            "episodes_per_hour": round((aligned_now - aligned_before) / elapsed_h, 2) if elapsed_h else None,
+            "audio_hours_per_hour": round(audio_hours / elapsed_h, 2) if elapsed_h else None,
+        },
+        "stage_latency_s": latency_summary(spans),
+        "rework": rework_summary(spans),
+        "resources": resource_summary(samples, harness_samples),
+        "feed": server.stats,
+        "resume_check": verification,
+        "runs_detail": cycles,
+        "samples": samples,
+    }
+
+    report_path = workdir / "soak_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    print_summary(report)
+    print(f"Saved report to {report_path}")
+    return report
+
+
+def print_summary(report):
+    throughput, resources, check = report["throughput"], report["resources"], report["resume_check"]
+    print(
+        f"\n{report['runs']} runs in {report['elapsed_h']:.2f} h: {report['crashes_injected']} killed, "
+        f"{report['hung_runs']} hung, {report['failed_runs']} exited non-zero"
+    )
+    print(f"Throughput: {throughput['episodes_per_hour']} episodes/h, {throughput['audio_hours_per_hour']} audio h/h")
+
+    print(f"{'stage':<15}{'count':>7}" + "".join(f"{f'p{p}':>9}" for p in LATENCY_PERCENTILES) + f"{'max':>9}")
+    for stage, summary in report["stage_latency_s"].items():
+        print(
+            f"{stage:<15}{summary['count']:>7}"
+            + "".join(f"{summary[f'p{p}']:>9.1f}" for p in LATENCY_PERCENTILES)
+            + f"{summary['max']:>9.1f}"
+        )
+    if report["rework"]:
+        print(f"Reworked after crashes/failures: {report['rework']}")
+
+    print(
+        f"Resources: peak tree RSS {resources['peak_tree_rss_mb']} MB, peak tree FDs {resources['peak_tree_fds']}, "
+        f"worst in-run growth {resources['max_in_run_parent_rss_mb_per_hour']} MB/h "
+        f"and {resources['max_in_run_parent_fds_per_hour']} FDs/h, "
+        f"harness {resources['harness_rss_mb_per_hour']} MB/h and {resources['harness_fds_per_hour']} FDs/h"
+    )
+
+    problems = {key: check[key] for key in checks.PROBLEMS if check[key]}
+    print(
+        f"Resume check {'passed' if check['ok'] else 'FAILED'}: {check['aligned']}/{check['published']} aligned, "
+        f"{check['quarantined']} quarantined" + (f", problems {problems}" if problems else "")
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline soak test of the full pipeline with a synthetic feed and fake models")
+    parser.add_argument("--hours", type=float, default=4.0, help="How long to keep starting new runs")
+    parser.add_argument("--workdir", default="data/soak", help="Work folder for the config, data, logs and report")
+    parser.add_argument("--seed", type=int, default=0)
+
+    feed = parser.add_argument_group("feed")
+    feed.add_argument("--episodes", type=int, default=3000, help="Episodes the feed can publish")
+    feed.add_argument("--publish-per-cycle", type=int, default=25, help="New episodes released before each run")
+    feed.add_argument("--episode-seconds", type=float, default=600, help="Mean episode length")
+    feed.add_argument("--port", type=int, default=8765, help="Episode ids derive from the URL, keep it fixed to resume a workdir")
+    feed.add_argument("--http-error-rate", type=float, default=0.02, help="Share of enclosure requests answered with 503")
+    feed.add_argument("--http-truncate-rate", type=float, default=0.0, help="Share of enclosures cut off halfway")
+
+    models = parser.add_argument_group("fake models")
+    models.add_argument("--whisper-latency", type=float, default=0.5, help="Seconds per minute of audio")
+    models.add_argument("--pyannote-latency", type=float, default=0.3, help="Seconds per minute of audio")
+    models.add_argument("--whisper-ballast-mb", type=float, default=300)
+    models.add_argument("--pyannote-ballast-mb", type=float, default=200)
+    models.add_argument("--leak-mb", type=float, default=5, help="Memory each model keeps per episode")
+    models.add_argument("--model-load-s", type=float, default=2)
+    models.add_argument("--model-error-rate", type=float, default=0.01)
+
+    faults = parser.add_argument_group("crashes")
+    faults.add_argument("--crash-rate", type=float, default=0.3, help="Share of runs killed with SIGKILL")
+    faults.add_argument("--crash-min-s", type=float, default=5)
+    faults.add_argument("--crash-max-s", type=float, default=300)
+    faults.add_argument("--cycle-timeout-s", type=float, default=3600, help="Runs longer than this are killed and counted as hung")
+
+    pipeline = parser.add_argument_group("pipeline")
+    pipeline.add_argument("--audio-format", choices=["wav", "flac", "none"], default="wav")
+    pipeline.add_argument("--fingerprinting", action=argparse.BooleanOptionalAction, default=True)
+    pipeline.add_argument("--speakers", action=argparse.BooleanOptionalAction, default=True)
+    pipeline.add_argument("--max-episodes-per-worker", type=int, default=10)
+    pipeline.add_argument("--worker-max-rss-mb", type=float, default=1000)
+    pipeline.add_argument("--retry-delay-s", type=float, default=5, help="Backoff base delay written to the soak config")
+
+    run = parser.add_argument_group("run")
+    run.add_argument("--pause-s", type=float, default=0, help="Wait between runs, like a cron interval")
+    run.add_argument("--drain-cycles", type=int, default=5, help="Clean runs after the deadline to settle the backlog")
+    run.add_argument("--sample-interval-s", type=float, default=2)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    report = run_soak(parse_args())
+    sys.exit(0 if report["resume_check"]["ok"] else 1)
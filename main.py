@@ -1,12 +1,14 @@
-from src import config, extract, transform, load
+from src import config, extract, transform, load, supervisor, failures, fingerprint, speakers, audio
 import multiprocessing
+import argparse
+import sys
 import datetime
 import json
 from pathlib import Path
 import torch
 import gc
 
-from src.logger import init_logger
+from src.logger import init_logger, log_context, configure_worker_logging
 logger = init_logger(__name__)
 
 ### PIPELINE REGISTRY ###
@@ -14,18 +16,28 @@ STAGE_MAP = {
     "ingestion": {
         "audio_folder": config.RAW_AUDIO_DIR,
         "manifest_folder": config.MANIFEST_DIR,
+        "intermediate_folder": config.WAV_AUDIO_DIR,
     },
     "processing": {
         "folder": config.WAV_AUDIO_DIR,
-        "ready": lambda m: m.get("audio_path") and not m.get("wav_path"),
+        "ready": lambda m: m.get("audio_path") and not audio.get_handle(m),
     },
+    "fingerprinting": {
+        "folder": config.FINGERPRINTS_DIR,
+        "ready": lambda m: audio.get_handle(m) and not m.get("fingerprint_complete"),
+    },
+    # With fingerprinting on, the ML stages wait for repeated spans to be known so they can skip them
     "transcription": {
         "folder": config.TRANSCRIPTS_DIR,
-        "ready": lambda m: m.get("wav_path") and not m.get("transcription_complete"),
+        "ready": lambda m: audio.get_handle(m) and 
+                           spans_settled(m) and 
+                           not m.get("transcription_complete"),
     },
     "diarization": {
         "folder": config.DIARIZATIONS_DIR,
-        "ready": lambda m: m.get("wav_path") and not m.get("diarization_complete"),
+        "ready": lambda m: audio.get_handle(m) and 
+                           spans_settled(m) and 
+                           not m.get("diarization_complete"),
     },
     "alignment": {
         "folder": config.ALIGNED_SCRIPTS_DIR,
@@ -35,6 +47,19 @@ STAGE_MAP = {
     }
 }
 
+def spans_settled(metadata):
+    """
+    Repeated spans are known, or never will be: fingerprinting is only an optimisation, so a
+    quarantined fingerprinting stage lets the ML stages run over the whole episode
+    """
+    if not config.FINGERPRINT_ENABLED or metadata.get("fingerprint_complete"):
+        return True
+    return bool((failures.get_failure(metadata, "fingerprinting") or {}).get("quarantined"))
+
+def is_ready(stage_name, metadata):
+    """A stage's STAGE_MAP rule, held back while that stage is backing off or quarantined"""
+    return bool(STAGE_MAP[stage_name]["ready"](metadata)) and failures.is_eligible(metadata, stage_name)
+
 def get_stage_todo(stage_name):
     """
     Returns a list of (manifest_path, metadata) for a specific stage 
@@ -51,8 +76,8 @@ def get_stage_todo(stage_name):
             with open(m_path, "r", encoding="utf-8") as f:
                 metadata = json.load(f)
             
-            # Check the "ready" lambda defined at the top
-            if conf["ready"](metadata):
+            # Check the "ready" lambda defined at the top, and any failure backoff
+            if is_ready(stage_name, metadata):
                 todo.append((m_path, metadata))
         except Exception as e:
             logger.error(f"Error reading manifest {m_path.name}: {e}")
@@ -83,124 +108,243 @@ def ingest_stage():
             if manifest_path.exists():
                 continue
 
-            logger.info(f"New episode detected: {ep_data["title"]}")
-            audio_stream = extract.stream_audio(ep_data["audio_url"])
-
-            if audio_stream:
-                ep_data["audio_path"] = str(audio_path)
-                ep_data["manifest_path"] = str(manifest_path)
-
-                load.save_ep_audio_stream(audio_stream, ep_data["audio_path"])
-                load.save_ep_manifest(ep_data, manifest_path)
+            with log_context(episode_id=ep_id):
+                logger.info(f"New episode detected: {ep_data["title"]}")
+                audio_stream = extract.stream_audio(ep_data["audio_url"])
+
+                if audio_stream:
+                    ep_data["audio_path"] = str(audio_path)
+                    ep_data["manifest_path"] = str(manifest_path)
+                    ep_data["feed_id"] = fingerprint.feed_id_for(ep_data)
+
+                    if config.AUDIO_INTERMEDIATE_FORMAT == "none":
+                        # No intermediate, models decode the MP3 on demand
+                        downloaded = load.save_ep_audio_stream(audio_stream, ep_data["audio_path"])
+                        ep_data["audio_handle"] = audio.decode_handle(ep_data["audio_path"])
+                    elif config.STREAM_TO_FFMPEG:
+                        # Convert while downloading, the processing stage picks up a failed conversion
+                        converted_path = audio.intermediate_path(conf["intermediate_folder"], ep_id, config.AUDIO_INTERMEDIATE_FORMAT)
+                        command = audio.build_ffmpeg_command("pipe:0", str(converted_path), config.AUDIO_INTERMEDIATE_FORMAT)
+
+                        downloaded, converted = load.save_ep_audio_stream_tee(audio_stream, ep_data["audio_path"], str(converted_path), command)
+                        if converted:
+                            ep_data["audio_handle"] = str(converted_path)
+                        elif downloaded:
+                            logger.warning(f"Streamed conversion failed, falling back to processing stage: {ep_data['title']}")
+                    else:
+                        downloaded = load.save_ep_audio_stream(audio_stream, ep_data["audio_path"])
+
+                    # Without a manifest the episode is downloaded again on the next run
+                    if not downloaded:
+                        logger.warning(f"Download incomplete, retrying on the next run: {ep_data['title']}")
+                        continue
+
+                    load.save_ep_manifest(ep_data, manifest_path)
 
         except Exception as err:
             logger.error(f"Ingestion error: {err}")
 
 def process_stage():
-    """Stage 2: MP3 -> WAV (16k Mono)"""
+    """Stage 2: MP3 -> Audio handle (16k Mono WAV/FLAC intermediate, or decode on demand)"""
 
-    to_process, wav_folder = get_stage_todo("processing")
+    to_process, intermediate_folder = get_stage_todo("processing")
+    audio_format = config.AUDIO_INTERMEDIATE_FORMAT
 
     if not to_process:
         logger.info("Processing: No new MP3s to convert.")
         return
 
     for m_path, metadata in to_process:
-        try:
-            mp3_path = metadata["audio_path"]
-            wav_path = wav_folder / f"{metadata['episode_id']}.wav"
-
-            logger.info(f"Converting: {metadata['title']}")
-            success = transform.convert_to_wav_ffmpeg(str(mp3_path), str(wav_path))
-
-            if success:
-                metadata["wav_path"] = str(wav_path)
-                load.save_ep_manifest(metadata, m_path)
+        with log_context(episode_id=metadata["episode_id"]):
+            try:
+                mp3_path = metadata["audio_path"]
+
+                if audio_format == "none":
+                    success = True
+                    handle = audio.decode_handle(mp3_path)
+                else:
+                    converted_path = audio.intermediate_path(intermediate_folder, metadata["episode_id"], audio_format)
+
+                    logger.info(f"Converting: {metadata['title']}")
+                    success = transform.convert_audio_ffmpeg(str(mp3_path), str(converted_path), audio_format)
+                    handle = str(converted_path)
+
+                if success:
+                    metadata["audio_handle"] = handle
+                    failures.clear_failure(metadata, "processing")
+                    load.save_ep_manifest(metadata, m_path)
+                else:
+                    failures.record_failure(metadata, m_path, "processing", "FFmpeg conversion failed")
                 
-        except Exception as err:
-            logger.error(f"Failed to convert {metadata['title']}: {err}")
+            except Exception as err:
+                logger.error(f"Failed to convert {metadata['title']}: {err}")
+                failures.record_failure(metadata, m_path, "processing", err)
     
 
-def transcription_stage():
-    """Stage 3: WAV -> Transcription"""
+def fingerprint_stage():
+    """Stage 2b: WAV -> Fingerprint index & repeated spans (intros, outros, ad reads)"""
 
-    to_process, save_folder = get_stage_todo("transcription")
+    to_process, fingerprint_folder = get_stage_todo("fingerprinting")
 
     if not to_process:
-        logger.info("Transcription: No work found.")
+        logger.info("Fingerprinting: No work found.")
         return
 
-    logger.info(f"Loading Whisper for {len(to_process)} items...")
-    model = transform.init_faster_whisper()
-
     for m_path, metadata in to_process:
-        try:
-
-            logger.info(f"Starting transcription: {metadata["title"]}")
-
-            result = transform.run_whisper_pipeline(model, metadata["wav_path"])
-
-            # Save transcription assets
-            base_name = save_folder / metadata['episode_id']
-            paths = load.save_transcription_assets(str(base_name), result)
-            
-            # If save completed, update manifest file to mark transcription as completed
-            if paths:
-                metadata.update({
-                    "transcript_path_full": paths["full"],
-                    "transcript_path_lite": paths["lite"],
-                    "transcript_path_txt": paths["txt"],
-                    "transcription_complete": True 
-                }) 
+        with log_context(episode_id=metadata["episode_id"]):
+            try:
+                logger.info(f"Fingerprinting: {metadata['title']}")
+
+                samples = audio.load_audio(audio.get_handle(metadata))
+                feed_folder = fingerprint_folder / fingerprint.feed_id_for(metadata)
+                spans = fingerprint.index_episode(
+                    samples, metadata["episode_id"], feed_folder, config.FINGERPRINT_SETTINGS
+                )
+
+                if spans:
+                    repeated_s = sum(span["end"] - span["start"] for span in spans)
+                    logger.info(f"Found {len(spans)} repeated spans ({repeated_s:.0f}s)")
+
+                metadata["repeated_spans"] = spans
+                metadata["fingerprint_complete"] = True
+                failures.clear_failure(metadata, "fingerprinting")
                 load.save_ep_manifest(metadata, m_path)
 
-        except Exception as err:
-            logger.error(f"Failed to transcribe {metadata["title"]}: {err}")
+            except Exception as err:
+                logger.error(f"Failed to fingerprint {metadata['title']}: {err}")
+                failures.record_failure(metadata, m_path, "fingerprinting", err)
 
-    del model
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
 
+def get_reusable_spans(metadata, complete_key):
+    """Repeated spans whose owner episode already has results for this stage"""
+    if not config.FINGERPRINT_ENABLED:
+        return []
+
+    reusable = fingerprint.reusable_spans(metadata, complete_key, config.MANIFEST_DIR)
+    if reusable:
+        reused_s = sum(span["end"] - span["start"] for span, _ in reusable)
+        logger.info(f"Reusing stored results for {len(reusable)} repeated spans ({reused_s:.0f}s)")
+
+    return reusable
 
-def diarization_stage():
-    """Stage 4: WAV -> Diarization"""
 
-    to_process, save_folder = get_stage_todo("diarization")
+def load_whisper_model():
+    if config.CHUNKING_ENABLED:
+        return transform.init_faster_whisper(num_workers=config.TRANSCRIPTION_WORKERS)
+    return transform.init_faster_whisper()
+
+
+def transcribe_episode(model, m_path, metadata):
+    """Transcribes one episode and marks it complete in its manifest, returns True once saved"""
+    save_folder = STAGE_MAP["transcription"]["folder"]
+
+    logger.info(f"Starting transcription: {metadata['title']}")
+
+    reusable = get_reusable_spans(metadata, "transcription_complete")
+    skip_spans = [(span["start"], span["end"]) for span, _ in reusable]
+
+    if config.CHUNKING_ENABLED:
+        result = transform.run_whisper_pipeline_chunked(
+            model,
+            audio.get_handle(metadata),
+            min_duration_s=config.CHUNK_MIN_DURATION_S,
+            chunk_length_s=config.CHUNK_LENGTH_S,
+            overlap_s=config.CHUNK_OVERLAP_S,
+            workers=config.TRANSCRIPTION_WORKERS,
+            skip_spans=skip_spans
+        )
+    else:
+        result = transform.run_whisper_pipeline(model, audio.get_handle(metadata), skip_spans=skip_spans)
+
+    if reusable:
+        result = fingerprint.reuse_transcript_chunks(result, reusable)
+
+    # Save transcription assets
+    base_name = save_folder / metadata['episode_id']
+    paths = load.save_transcription_assets(str(base_name), result)
+
+    # If save completed, update manifest file to mark transcription as completed
+    if not paths:
+        return False
+
+    metadata.update({
+        "transcript_path_full": paths["full"],
+        "transcript_path_lite": paths["lite"],
+        "transcript_path_txt": paths["txt"],
+        "transcription_complete": True 
+    }) 
+    failures.clear_failure(metadata, "transcription")
+    load.save_ep_manifest(metadata, m_path)
+    return True
+
+
+def diarize_episode(pyannote_pipe, m_path, metadata):
+    """Diarizes one episode and marks it complete in its manifest, returns True once saved"""
+    save_folder = STAGE_MAP["diarization"]["folder"]
+
+    logger.info(f"Starting diarization: {metadata['title']}")
+
+    reusable = get_reusable_spans(metadata, "diarization_complete")
+    skip_spans = [(span["start"], span["end"]) for span, _ in reusable]
+
+    result, embeddings = transform.run_pyannote(
+        pyannote_pipe, audio.get_handle(metadata), skip_spans=skip_spans, return_embeddings=True
+    )
+
+    if reusable:
+        result = fingerprint.reuse_diarization_turns(result, reusable)
+
+    # Save diarization to JSON, and cache speaker embeddings so identities never need a re-run
+    diarize_path = save_folder / f"{metadata['episode_id']}_diarization.json"
+    embeddings_path = save_folder / f"{metadata['episode_id']}_speaker_embeddings.json"
+    success = load.save_diarization(str(diarize_path), result)
+    success_embeddings = load.save_speaker_embeddings(str(embeddings_path), embeddings)
+
+    # If save completed, update manifest file to mark diarization as complete
+    if not success:
+        return False
+
+    metadata["diarization_path"] = str(diarize_path)
+    if success_embeddings:
+        metadata["speaker_embeddings_path"] = str(embeddings_path)
+        metadata.pop("speaker_identities", None)
+    # One check for if diarization completed
+    metadata["diarization_complete"] = True 
+    failures.clear_failure(metadata, "diarization")
+    load.save_ep_manifest(metadata, m_path)
+    return True
+
+
+def apply_speaker_identities(metadata, diarization_data, store):
+    """Swaps anonymous diarization labels for persistent speaker identities, using cached embeddings"""
+    if not metadata.get("speaker_embeddings_path"):
+        logger.info("No cached speaker embeddings, keeping anonymous labels")
+    elif not metadata.get("speaker_identities"):
+        with open(metadata["speaker_embeddings_path"], "r", encoding="utf-8") as f:
+            embeddings = json.load(f)
+
+        metadata["speaker_identities"] = speakers.identify_speakers(
+            metadata["episode_id"], embeddings, store, config.SPEAKER_MATCH_THRESHOLD, config.SPEAKER_AUTO_ENROLL
+        )
+        speakers.save_store(config.SPEAKERS_DIR, store)
+
+    # Turns reused from another episode carry that episode's labels, and stay namespaced
+    # by it until that episode has identities of its own
+    source_identities = {}
+    for turn in diarization_data:
+        source_id = turn.get("source_episode_id")
+        if source_id and source_id not in source_identities:
+            source_path = config.MANIFEST_DIR / f"{source_id}.json"
+            try:
+                with open(source_path, "r", encoding="utf-8") as f:
+                    source_identities[source_id] = json.load(f).get("speaker_identities") or {}
+            except Exception as err:
+                logger.warning(f"Cannot read speaker identities of {source_id}: {err}")
+                source_identities[source_id] = {}
+
+    return speakers.relabel_turns(diarization_data, metadata.get("speaker_identities") or {}, store, source_identities)
 
-    if not to_process:
-        logger.info("Diarization: No work found.")
-        return
-    
 
-    ### If diarization needs to be done, load model and diarize each episode ###
-    logger.info(f"Loading pyannote diarization for {len(to_process)} items...")
-    pyannote_pipe = transform.init_pyannote()
-
-    for m_path, metadata in to_process:
-        try:
-            logger.info(f"Starting diarization: {metadata["title"]}")
-
-            result = transform.run_pyannote(pyannote_pipe, metadata["wav_path"])
-
-            # Save diarization to JSON
-            diarize_path = save_folder / f"{metadata['episode_id']}_diarization.json"
-            success = load.save_diarization(str(diarize_path), result)
-            
-            # If save completed, update manifest file to mark diarization as complete
-            if success:
-                metadata["diarization_path"] = str(diarize_path)
-                # One check for if diarization completed
-                metadata["diarization_complete"] = True 
-                load.save_ep_manifest(metadata, m_path)
-
-        except Exception as err:
-            logger.error(f"Failed to diarize {metadata["title"]}: {err}")
-
-    del pyannote_pipe
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
-
-    
 def alignment_stage():
     """Stage 5: Merge Transcript + Diarization -> Final Script"""
     to_process, save_folder = get_stage_todo("alignment")
@@ -211,70 +355,251 @@ def alignment_stage():
     
     ### If alignments needs to be done, loop over files to process and save ###
     logger.info("Aligning new transcriptions and diarizations...")
+    speaker_store = speakers.load_store(config.SPEAKERS_DIR) if config.SPEAKERS_ENABLED else None
 
     for m_path, metadata in to_process:
-        try:
-            logger.info(f"Starting alignment: {metadata["title"]}")
-
-            with open(metadata["transcript_path_full"], "r", encoding="utf-8") as f:
-                transcript_data = json.load(f)
-            with open(metadata["diarization_path"], "r", encoding="utf-8") as f:
-                diarization_data = json.load(f)
-
-            aligned_script = transform.merge_transcript_and_diarization(
-                transcript_data["chunks"],
-                diarization_data
-            )
+        with log_context(episode_id=metadata["episode_id"]):
+            try:
+                logger.info(f"Starting alignment: {metadata["title"]}")
+
+                with open(metadata["transcript_path_full"], "r", encoding="utf-8") as f:
+                    transcript_data = json.load(f)
+                with open(metadata["diarization_path"], "r", encoding="utf-8") as f:
+                    diarization_data = json.load(f)
+
+                if speaker_store is not None:
+                    diarization_data = apply_speaker_identities(metadata, diarization_data, speaker_store)
+
+                aligned_script = transform.merge_transcript_and_diarization(
+                    transcript_data["chunks"],
+                    diarization_data
+                )
             
-            # Also create aligned script in human readable format for post-processing with LLM
-            readable_script = transform.format_to_human_readable_script(aligned_script)
+                # Also create aligned script in human readable format for post-processing with LLM
+                readable_script = transform.format_to_human_readable_script(aligned_script)
 
-            # Save aligned script to JSON and readable script to txt
-            aligned_script_path = save_folder / f"{metadata['episode_id']}_aligned_script.json"
-            readable_script_path = save_folder / f"{metadata["episode_id"]}_readable_script.txt"
+                # Save aligned script to JSON and readable script to txt
+                aligned_script_path = save_folder / f"{metadata['episode_id']}_aligned_script.json"
+                readable_script_path = save_folder / f"{metadata["episode_id"]}_readable_script.txt"
             
-            success_json_save = load.save_aligned_script(str(aligned_script_path), aligned_script)
-            success_txt_save = load.save_readable_script(str(readable_script_path), readable_script)
+                success_json_save = load.save_aligned_script(str(aligned_script_path), aligned_script)
+                success_txt_save = load.save_readable_script(str(readable_script_path), readable_script)
                 
-            # If save completed, update manifest file to mark diarization as complete
-            if success_json_save and success_txt_save:
-                metadata["aligned_script_path"] = str(aligned_script_path)
-                metadata["readable_script_path"] = str(readable_script_path)
-                # One check for if alignment completed
-                metadata["alignment_complete"] = True 
-                load.save_ep_manifest(metadata, m_path)
-
-        except Exception as err:
-            logger.error(f"Failed to align script for: {metadata["title"]}: {err}")
+                # If save completed, update manifest file to mark diarization as complete
+                if success_json_save and success_txt_save:
+                    metadata["aligned_script_path"] = str(aligned_script_path)
+                    metadata["readable_script_path"] = str(readable_script_path)
+                    # One check for if alignment completed
+                    metadata["alignment_complete"] = True 
+                    failures.clear_failure(metadata, "alignment")
+                    load.save_ep_manifest(metadata, m_path)
+                else:
+                    failures.record_failure(metadata, m_path, "alignment", "Failed to save aligned script")
+
+            except Exception as err:
+                logger.error(f"Failed to align script for: {metadata["title"]}: {err}")
+                failures.record_failure(metadata, m_path, "alignment", err)
 
         
 ### Subprocess wrappers ###
 
-def transcription_worker():
-    """Isolated worker for Stage 3"""
-    try:
-        logger.info("Child Process: Starting Transcription Stage")
-        transcription_stage()
-        logger.info("Child Process: Transcription Stage Finished")
-    except Exception as err:
-        logger.error(f"Transcription Process Failed: {err}")
-        exit(1) 
+def transcription_worker(task_queue, result_conn, log_queue):
+    """Isolated, supervised worker for Stage 3: loads Whisper once and serves episodes"""
+    configure_worker_logging(log_queue)
+    with log_context(stage="transcription"):
+        try:
+            logger.info("Child Process: Loading Whisper")
+            model = load_whisper_model()
+            supervisor.serve_episodes(
+                task_queue, result_conn, lambda m_path, metadata: transcribe_episode(model, m_path, metadata)
+            )
+            logger.info("Child Process: Transcription Worker Finished")
+        except Exception as err:
+            logger.error(f"Transcription Process Failed: {err}")
+            exit(1)
 
-def diarization_worker():
-    """Isolated worker for Stage 4"""
-    try:
-        logger.info("Child Process: Starting Diarization Stage")
-        diarization_stage()
-        logger.info("Child Process: Diarization Stage Finished")
-    except Exception as err:
-        logger.error(f"Diarization Process Failed: {err}")
-        exit(1)
+def diarization_worker(task_queue, result_conn, log_queue):
+    """Isolated, supervised worker for Stage 4: loads pyannote once and serves episodes"""
+    configure_worker_logging(log_queue)
+    with log_context(stage="diarization"):
+        try:
+            logger.info("Child Process: Loading pyannote")
+            pyannote_pipe = transform.init_pyannote()
+            supervisor.serve_episodes(
+                task_queue, result_conn, lambda m_path, metadata: diarize_episode(pyannote_pipe, m_path, metadata)
+            )
+            logger.info("Child Process: Diarization Worker Finished")
+        except Exception as err:
+            logger.error(f"Diarization Process Failed: {err}")
+            exit(1)
+
+
+def supervised_stage(stage_name, worker_target):
+    """Runs an ML stage in recycled worker processes, see src/supervisor.py"""
+    to_process, _ = get_stage_todo(stage_name)
+
+    if not to_process:
+        logger.info(f"{stage_name.capitalize()}: No work found.")
+        return
+
+    logger.info(f"{stage_name.capitalize()}: {len(to_process)} items for supervised workers")
+    supervisor.run_supervised_stage(
+        stage_name,
+        to_process,
+        lambda metadata: is_ready(stage_name, metadata),
+        worker_target,
+        config.SUPERVISOR_SETTINGS,
+        config.REPORTS_DIR
+    )
+
+
+
+### Quarantine command ###
+
+def quarantine_command(args):
+    """Lists or releases episode stages quarantined after repeated failures"""
+    if args.action == "list":
+        quarantined = failures.list_quarantined(config.MANIFEST_DIR)
+        if not quarantined:
+            print("No quarantined episodes.")
+        for _, metadata, stage in quarantined:
+            failure = failures.get_failure(metadata, stage)
+            print(
+                f"{metadata['episode_id']}  {stage:<13}  attempts={failure['attempts']}  "
+                f"last_failed_at={failure['last_failed_at']}  {metadata.get('title')}\n"
+                f"    {failure['last_error']}"
+            )
+        return
 
+    if not args.episode_id and not args.all:
+        print("Pass an episode_id or --all to release.")
+        return
+
+    released = failures.release(config.MANIFEST_DIR, episode_id=args.episode_id, stage=args.stage)
+    print(f"Released {released} quarantined stage(s).")
+
+
+### Speakers command ###
+
+def speakers_command(args):
+    """Lists and names persistent speaker identities, or queues every episode for re-alignment"""
+    store = speakers.load_store(config.SPEAKERS_DIR)
+
+    if args.action == "list":
+        if not store["speakers"]:
+            print("No known speakers.")
+        for speaker in store["speakers"]:
+            print(f"{speaker['speaker_id']}  {speaker.get('name') or '-':<24}  episodes={len(speaker['episodes'])}")
+        return
+
+    if args.action == "name":
+        if not args.speaker_id or not args.name:
+            print("Usage: python main.py speakers name <speaker_id> <name>")
+            return
+        if not speakers.rename_speaker(store, args.speaker_id, args.name):
+            print(f"Unknown speaker {args.speaker_id}")
+            return
+        speakers.save_store(config.SPEAKERS_DIR, store)
+        print(f"Named {args.speaker_id} '{args.name}'. Run 'speakers relabel' to update aligned scripts.")
+        return
+
+    # relabel: alignment is cheap and reads the cached embeddings, so just mark it as not done
+    relabelled = 0
+    for m_path in config.MANIFEST_DIR.glob("*.json"):
+        with open(m_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        if metadata.get("alignment_complete"):
+            metadata["alignment_complete"] = False
+            load.save_ep_manifest(metadata, m_path)
+            relabelled += 1
+    print(f"{relabelled} episode(s) will be re-aligned with current speaker names on the next run.")
+
+
+### Audio report command ###
+
+def audio_report_command(args):
+    """Measures each intermediate format on a sample of MP3s and extrapolates to the whole archive"""
+    mp3_paths = sorted(config.RAW_AUDIO_DIR.glob("*.mp3"))
+    if not mp3_paths:
+        print(f"No MP3s in {config.RAW_AUDIO_DIR} to measure.")
+        return
+
+    # Every model stage loads the full input once: fingerprinting (optional), transcription, diarization
+    reads_per_episode = 3 if config.FINGERPRINT_ENABLED else 2
+    step = max(1, len(mp3_paths) // args.sample)
+    sample = mp3_paths[::step][:args.sample]
+    totals = audio.measure_intermediate_formats(sample, reads_per_episode)
+
+    measured_episodes = totals["source"]["episodes"]
+    if not measured_episodes or not totals["source"]["bytes"] or not totals["source"]["audio_s"]:
+        print(f"None of the {len(sample)} sampled episodes could be measured, see the log for why.")
+        return
+
+    archive_bytes = sum(path.stat().st_size for path in mp3_paths)
+    scale = archive_bytes / totals["source"]["bytes"]
+    sample_hours = totals["source"]["audio_s"] / 3600
+
+    report = {
+        "sample_episodes": measured_episodes,
+        "skipped_episodes": len(sample) - measured_episodes,
+        "archive_episodes": len(mp3_paths),
+        "archive_mp3_bytes": archive_bytes,
+        "reads_per_episode": reads_per_episode,
+        "formats": {},
+    }
+    print(
+        f"Sample: {measured_episodes} of {len(mp3_paths)} episodes ({len(sample) - measured_episodes} skipped), "
+        f"{sample_hours:.1f} h of audio, {reads_per_episode} reads per episode"
+    )
+    print(f"{'format':<8}{'MB/hour':>10}{'archive GB':>12}{'read GB/pass':>14}{'load s/hour':>13}")
+
+    for fmt in audio.INTERMEDIATE_FORMATS:
+        measured = totals[fmt]
+        row = {
+            "mb_per_hour": measured["bytes_on_disk"] / 2**20 / sample_hours,
+            "archive_gb": measured["bytes_on_disk"] * scale / 2**30,
+            "archive_read_gb_per_pass": measured["bytes_read"] * scale / 2**30,
+            "load_s_per_hour": measured["load_s"] / sample_hours,
+        }
+        report["formats"][fmt] = row
+        print(
+            f"{fmt:<8}{row['mb_per_hour']:>10.1f}{row['archive_gb']:>12.1f}"
+            f"{row['archive_read_gb_per_pass']:>14.1f}{row['load_s_per_hour']:>13.2f}"
+        )
+
+    report_path = config.REPORTS_DIR / f"audio_formats_{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
+    load.save_to_json(report_path, report)
+    print(f"Saved report to {report_path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Podcast transcription pipeline")
+    commands = parser.add_subparsers(dest="command")
+
+    quarantine = commands.add_parser("quarantine", help="List or release quarantined episodes")
+    quarantine.add_argument("action", choices=["list", "release"])
+    quarantine.add_argument("episode_id", nargs="?", help="Episode to release")
+    quarantine.add_argument("--stage", help="Only release this stage")
+    quarantine.add_argument("--all", action="store_true", help="Release every quarantined episode")
+
+    speaker_parser = commands.add_parser("speakers", help="Manage persistent speaker identities")
+    speaker_parser.add_argument("action", choices=["list", "name", "relabel"])
+    speaker_parser.add_argument("speaker_id", nargs="?", help="Speaker to name, e.g. speaker_001")
+    speaker_parser.add_argument("name", nargs="?", help="Display name for the speaker")
+
+    audio_report = commands.add_parser("audio-report", help="Measure disk and decode cost of each intermediate audio format")
+    audio_report.add_argument("--sample", type=int, default=10, help="Number of downloaded episodes to measure")
+
+    args = parser.parse_args()
+    if args.command == "audio-report" and args.sample < 1:
+        audio_report.error("--sample must be at least 1")
+    return args
 
 
 ### Main ###
 
-if __name__ == "__main__":
+def run_pipeline():
+    """Runs every stage once over whatever the manifests say is outstanding, returns True if no stage raised"""
     multiprocessing.set_start_method('spawn', force=True)
     
     start = datetime.datetime.now()
@@ -283,49 +608,52 @@ if __name__ == "__main__":
     try:
         ### Stage 1: Ingestion ###
         logger.info("--- Stage 1: Ingestion ---")
-        ingest_stage()
+        with log_context(stage="ingestion"):
+            ingest_stage()
 
 
         ### Stage 2: Pre-processing
         logger.info("--- Stage 2: Pre-processing ---")
-        process_stage()
+        with log_context(stage="processing"):
+            process_stage()
+
+        ### Stage 2b: Fingerprinting (optional)
+        if config.FINGERPRINT_ENABLED:
+            logger.info("--- Stage 2b: Fingerprinting ---")
+            with log_context(stage="fingerprinting"):
+                fingerprint_stage()
 
         """ 
         Note: There seems to be an issue relating to faster-whisper's use of ctranslate2 to
         manage memory and the clean up process - possibly the use of 'del f_whisper_model'
         which leads to a crash. For safety, both transcription and diarization are managed
-        by subprocesses which enforces the OS to act as the ultimate garbage collector. And
-        
-        As the transcription is saved to disk before the crash, we can ignore it and continue
-        the script
+        by subprocesses which enforces the OS to act as the ultimate garbage collector.
+
+        The supervisor keeps each worker (and its loaded model) for several episodes, but
+        recycles it after supervisor.max_episodes_per_worker episodes or once its memory
+        crosses the configured limits, requeueing any episode that was in flight. As results
+        are saved to disk per episode, a crash on teardown can be ignored.
          """
 
-        ### Stage 3: Transcription (Subprocess) ###
-        logger.info("--- Stage 3: Transcription [Isolated Process] ---")
-        p_trans = multiprocessing.Process(target=transcription_worker)
-        p_trans.start()
-        p_trans.join()
-        
-        if p_trans.exitcode != 0:
-            logger.error(f"Transcription crashed (Code {p_trans.exitcode}).")
+        ### Stage 3: Transcription (Supervised Subprocesses) ###
+        logger.info("--- Stage 3: Transcription [Supervised Processes] ---")
+        with log_context(stage="transcription"):
+            supervised_stage("transcription", transcription_worker)
         
         # Ensure cleanup between processes
         gc.collect()
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
-        ### Stage 4: Diarization (Subprocess) ###
-        logger.info("--- Stage 4: Diarization [Isolated Process] ---")
-        p_diar = multiprocessing.Process(target=diarization_worker)
-        p_diar.start()
-        p_diar.join()
-        
-        if p_diar.exitcode != 0:
-            logger.error(f"Diarization crashed (Code {p_diar.exitcode}).")
+        ### Stage 4: Diarization (Supervised Subprocesses) ###
+        logger.info("--- Stage 4: Diarization [Supervised Processes] ---")
+        with log_context(stage="diarization"):
+            supervised_stage("diarization", diarization_worker)
         
         ### Stage 5: Alignment
         logger.info("--- Stage 5: Alignment ---")
-        alignment_stage() 
+        with log_context(stage="alignment"):
+            alignment_stage()
 
 
         complete = True
@@ -336,4 +664,21 @@ if __name__ == "__main__":
     
     if complete:
         end = datetime.datetime.now()
-        logger.info(f"Pipeline finished successfully in {end - start}")
\ No newline at end of file
+        logger.info(f"Pipeline finished successfully in {end - start}")
+
+    return complete
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "quarantine":
+        quarantine_command(args)
+        sys.exit(0)
+    if args.command == "speakers":
+        speakers_command(args)
+        sys.exit(0)
+    if args.command == "audio-report":
+        audio_report_command(args)
+        sys.exit(0)
+
+    run_pipeline()
@@ -0,0 +1,157 @@
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile
+
+from src.logger import init_logger
+logger = init_logger(__name__)
+
+# The manifest stores an audio handle ("audio_handle") for the 16 kHz mono model input rather
+# than a WAV path. A handle is either
+#   "<path>.wav" / "<path>.flac"   an intermediate file written by the processing stage, or
+#   "decode:<path>"                no intermediate at all, the source MP3 is decoded on demand.
+# Every consumer calls load_audio(handle) and gets a float32 NumPy buffer back. Manifests from
+# before handles existed only have "wav_path", which get_handle falls back to.
+
+SAMPLE_RATE = 16000
+DECODE_PREFIX = "decode:"
+INTERMEDIATE_FORMATS = ("wav", "flac", "none")
+
+
+### Handles ###
+
+def get_handle(metadata):
+    return metadata.get("audio_handle") or metadata.get("wav_path")
+
+
+def decode_handle(source_path):
+    return f"{DECODE_PREFIX}{source_path}"
+
+
+def intermediate_path(folder, episode_id, audio_format):
+    return Path(folder) / f"{episode_id}.{audio_format}"
+
+
+def handle_file(handle):
+    """The file a handle reads from, intermediate or source"""
+    return Path(handle[len(DECODE_PREFIX):] if handle.startswith(DECODE_PREFIX) else handle)
+
+
+### FFmpeg commands ###
+
+def build_ffmpeg_command(input_path: str, output_path: str, audio_format="wav"):
+    """Input may be a file path or 'pipe:0' to read the source audio from stdin"""
+    codec = {"wav": "pcm_s16le", "flac": "flac"}[audio_format]
+    return [
+        "ffmpeg",
+        "-y",               # Overwrite output file if it exists
+        "-i", input_path,
+        "-ar", str(SAMPLE_RATE),  # Audio rate
+        "-ac", "1",         # Audio channels (Mono)
+        "-c:a", codec,      # Codec: 16-bit PCM or lossless FLAC of the same samples
+        output_path
+    ]
+
+
+### Loading ###
+
+def load_audio(handle):
+    """Returns 16 kHz mono float32 samples for an audio handle"""
+    path = handle_file(handle)
+
+    if not handle.startswith(DECODE_PREFIX) and path.suffix.lower() in (".wav", ".flac"):
+        # Intermediates are already 16 kHz mono, libsndfile reads both without an ffmpeg process
+        samples, sample_rate = soundfile.read(path, dtype="float32", always_2d=False)
+        if sample_rate != SAMPLE_RATE or samples.ndim != 1:
+            raise ValueError(f"{path} is not {SAMPLE_RATE} Hz mono")
+        return samples
+
+    return decode_with_ffmpeg(path)
+
+
+def decode_with_ffmpeg(path):
+    """Decodes any ffmpeg-readable file straight into a NumPy buffer through a pipe"""
+    command = [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", str(path),
+        "-ar", str(SAMPLE_RATE), "-ac", "1",
+        "-f", "f32le", "pipe:1"
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg Error: {e.stderr.decode('utf-8', errors='replace')}") from e
+    except FileNotFoundError as e:
+        raise RuntimeError("FFmpeg is not installed or not in your PATH.") from e
+
+    return np.frombuffer(result.stdout, dtype="<f4")
+
+
+### Measurements ###
+
+def measure_intermediate_formats(source_paths, reads_per_episode):
+    """
+    Converts sample source files to each intermediate format in a temporary folder and measures
+    disk footprint, bytes read per pipeline pass (reads_per_episode loads of the input) and the
+    time to get samples into NumPy. Returns per-format totals over the sample. Sources that fail
+    to convert or decode to nothing are logged and left out of every total.
+    """
+    totals = {fmt: {"bytes_on_disk": 0, "bytes_read": 0, "load_s": 0.0} for fmt in INTERMEDIATE_FORMATS}
+    totals["source"] = {"episodes": 0, "bytes": 0, "audio_s": 0.0}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for source in source_paths:
+            source = Path(source)
+            try:
+                measured, audio_s = _measure_source(source, Path(tmp), reads_per_episode)
+            except (RuntimeError, ValueError, OSError) as err:
+                logger.warning(f"Skipping {source.name} in the audio report: {err}")
+                continue
+            if not audio_s:
+                logger.warning(f"Skipping {source.name} in the audio report: decoded to no audio")
+                continue
+
+            for fmt, values in measured.items():
+                for key, value in values.items():
+                    totals[fmt][key] += value
+            totals["source"]["episodes"] += 1
+            totals["source"]["bytes"] += source.stat().st_size
+            totals["source"]["audio_s"] += audio_s
+
+    return totals
+
+
+def _measure_source(source, tmp_folder, reads_per_episode):
+    """One source's per-format measurements and its duration in seconds"""
+    source_bytes = source.stat().st_size
+    measured = {}
+    audio_s = 0.0
+
+    for fmt in INTERMEDIATE_FORMATS:
+        if fmt == "none":
+            handle, stored, read = decode_handle(source), 0, source_bytes
+        else:
+            target = tmp_folder / f"{source.stem}.{fmt}"
+            try:
+                subprocess.run(build_ffmpeg_command(str(source), str(target), fmt), capture_output=True, check=True)
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"FFmpeg Error: {e.stderr.decode('utf-8', errors='replace')}") from e
+            handle = str(target)
+            stored = read = target.stat().st_size
+
+        started = time.perf_counter()
+        samples = load_audio(handle)
+        load_s = time.perf_counter() - started
+
+        measured[fmt] = {
+            "bytes_on_disk": stored,
+            "bytes_read": read * reads_per_episode,
+            "load_s": load_s * reads_per_episode,
+        }
+        if fmt == "none":
+            audio_s = len(samples) / SAMPLE_RATE
+
+    return measured, audio_s
@@ -1,7 +1,9 @@
+import os
 import yaml
 from pathlib import Path
 
-CONFIG_PATH = Path(__file__).resolve().parent.parent / "config.yaml"
+# PODCAST_TRANSCRIBER_CONFIG points the pipeline at another config file, e.g. the soak harness's
+CONFIG_PATH = Path(os.environ.get("PODCAST_TRANSCRIBER_CONFIG") or Path(__file__).resolve().parent.parent / "config.yaml")
 
 def load_config():
     if not CONFIG_PATH.exists():
@@ -13,8 +15,58 @@ def load_config():
 
 cfg = load_config()
 
+RSS_URL = cfg.get("rss_url")
 LIMIT = cfg.get("max_episodes") or None
 
+logging_cfg = cfg.get("logging") or {}
+LOG_LEVEL: str = str(logging_cfg.get("level", "INFO")).upper()
+LOG_FORMAT: str = logging_cfg.get("format", "json")
+
+ingestion_cfg = cfg.get("ingestion") or {}
+STREAM_TO_FFMPEG: bool = ingestion_cfg.get("stream_to_ffmpeg", True)
+
+audio_cfg = cfg.get("audio") or {}
+AUDIO_INTERMEDIATE_FORMAT: str = str(audio_cfg.get("intermediate_format") or "wav").lower()
+if AUDIO_INTERMEDIATE_FORMAT not in ("wav", "flac", "none"):
+    raise ValueError(f"audio.intermediate_format must be wav, flac or none, not {AUDIO_INTERMEDIATE_FORMAT}")
+
+transcription_cfg = cfg.get("transcription") or {}
+CHUNKING_ENABLED: bool = transcription_cfg.get("chunking_enabled", False)
+CHUNK_MIN_DURATION_S: float = transcription_cfg.get("chunk_min_duration_s", 3600)
+CHUNK_LENGTH_S: float = transcription_cfg.get("chunk_length_s", 900)
+CHUNK_OVERLAP_S: float = transcription_cfg.get("chunk_overlap_s", 10)
+TRANSCRIPTION_WORKERS: int = transcription_cfg.get("workers", 2)
+
+fingerprinting_cfg = cfg.get("fingerprinting") or {}
+FINGERPRINT_ENABLED: bool = fingerprinting_cfg.get("enabled", False)
+FINGERPRINT_SETTINGS: dict = {
+    "reference_episodes": fingerprinting_cfg.get("reference_episodes", 10),
+    "min_segment_s": fingerprinting_cfg.get("min_segment_s", 8),
+    "max_gap_s": fingerprinting_cfg.get("max_gap_s", 2),
+    "min_hits": fingerprinting_cfg.get("min_hits", 25),
+}
+
+speakers_cfg = cfg.get("speakers") or {}
+SPEAKERS_ENABLED: bool = speakers_cfg.get("enabled", False)
+SPEAKER_MATCH_THRESHOLD: float = speakers_cfg.get("match_threshold", 0.5)
+SPEAKER_AUTO_ENROLL: bool = speakers_cfg.get("auto_enroll", True)
+
+supervisor_cfg = cfg.get("supervisor") or {}
+SUPERVISOR_SETTINGS: dict = {
+    "max_episodes_per_worker": supervisor_cfg.get("max_episodes_per_worker") or 25,
+    "recycle_rss_mb": supervisor_cfg.get("recycle_rss_mb"),
+    "max_rss_mb": supervisor_cfg.get("max_rss_mb"),
+    "recycle_vram_mb": supervisor_cfg.get("recycle_vram_mb"),
+    "max_vram_mb": supervisor_cfg.get("max_vram_mb"),
+    "sample_interval_s": supervisor_cfg.get("sample_interval_s") or 5,
+    "max_requeues": supervisor_cfg.get("max_requeues", 1),
+}
+
+retries_cfg = cfg.get("retries") or {}
+RETRY_BASE_DELAY_S: float = retries_cfg.get("base_delay_s", 600)
+RETRY_MAX_DELAY_S: float = retries_cfg.get("max_delay_s", 86400)
+RETRY_MAX_ATTEMPTS: int = retries_cfg.get("max_attempts", 5)
+
 
 BASE_DATA = Path(cfg['paths']['data_root'])
 RAW_AUDIO_DIR: Path = BASE_DATA / cfg['paths']['raw_subfolder'] / cfg['paths']['raw_audio_subfolder']
@@ -23,10 +75,16 @@ WAV_AUDIO_DIR: Path = BASE_DATA / cfg['paths']['raw_subfolder'] / cfg['paths']['
 TRANSCRIPTS_DIR: Path = BASE_DATA / cfg['paths']['processed_subfolder'] / cfg['paths']['transcripts_subfolder']
 DIARIZATIONS_DIR: Path = BASE_DATA / cfg['paths']['processed_subfolder'] / cfg['paths']['diarizations_subfolder']
 ALIGNED_SCRIPTS_DIR: Path = BASE_DATA / cfg['paths']['processed_subfolder'] / cfg['paths']['aligned_scripts_subfolder']
+FINGERPRINTS_DIR: Path = BASE_DATA / cfg['paths']['processed_subfolder'] / cfg['paths'].get('fingerprints_subfolder', 'fingerprints')
+SPEAKERS_DIR: Path = BASE_DATA / cfg['paths']['processed_subfolder'] / cfg['paths'].get('speakers_subfolder', 'speakers')
+REPORTS_DIR: Path = BASE_DATA / cfg['paths'].get('reports_subfolder', 'reports')
 
 RAW_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
 WAV_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
 DIARIZATIONS_DIR.mkdir(parents=True, exist_ok=True)
-ALIGNED_SCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+ALIGNED_SCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+FINGERPRINTS_DIR.mkdir(parents=True, exist_ok=True)
+SPEAKERS_DIR.mkdir(parents=True, exist_ok=True)
+REPORTS_DIR.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
@@ -5,6 +5,7 @@ from bs4 import BeautifulSoup
 import datetime
 import hashlib
 
+from src import config
 from src.logger import init_logger
 logger = init_logger(__name__)
 
@@ -12,7 +13,7 @@ logger = init_logger(__name__)
 ### Request to get RSS text ###
 
 def fetch_rss_feed():
-    rss_url = "https://anchor.fm/s/fd1fcb44/podcast/rss"
+    rss_url = config.RSS_URL
 
     try:
         response = requests.get(rss_url)
@@ -0,0 +1,118 @@
+import datetime
+import json
+from pathlib import Path
+
+from src import config, load
+from src.logger import init_logger, log_context
+logger = init_logger(__name__)
+
+# Per-episode, per-stage failure tracking stored in the manifest under "failures":
+#   {"transcription": {"attempts": 2, "last_error": "...", "last_failed_at": "...",
+#                      "next_eligible_at": "...", "quarantined": false}}
+# A failed stage is retried with exponential backoff and quarantined after max_attempts,
+# after which it is skipped until released with `python main.py quarantine release`.
+
+
+def get_failure(metadata, stage):
+    return (metadata.get("failures") or {}).get(stage)
+
+
+def backoff_delay_s(attempts):
+    delay = config.RETRY_BASE_DELAY_S * 2 ** (attempts - 1)
+    return min(delay, config.RETRY_MAX_DELAY_S)
+
+
+def is_eligible(metadata, stage, now=None):
+    """False while a stage is quarantined or still backing off from its last failure"""
+    failure = get_failure(metadata, stage)
+    if not failure:
+        return True
+    if failure.get("quarantined"):
+        return False
+
+    now = now or datetime.datetime.now()
+    next_eligible_at = failure.get("next_eligible_at")
+    return not next_eligible_at or now >= datetime.datetime.fromisoformat(next_eligible_at)
+
+
+def record_failure(metadata, m_path, stage, error):
+    """Counts a failed attempt, schedules the next one and saves the manifest"""
+    failures = metadata.setdefault("failures", {})
+    failure = failures.get(stage) or {"attempts": 0}
+    now = datetime.datetime.now()
+
+    failure["attempts"] += 1
+    failure["last_error"] = str(error)
+    failure["last_failed_at"] = now.isoformat()
+    failure["quarantined"] = failure["attempts"] >= config.RETRY_MAX_ATTEMPTS
+    failure["next_eligible_at"] = (now + datetime.timedelta(seconds=backoff_delay_s(failure["attempts"]))).isoformat()
+    failures[stage] = failure
+
+    # Callers like the supervisor log outside the episode's context
+    with log_context(episode_id=metadata.get("episode_id"), stage=stage):
+        if failure["quarantined"]:
+            logger.error(f"Quarantined {metadata.get('title')} at {stage} after {failure['attempts']} attempts: {error}")
+        else:
+            logger.warning(
+                f"{stage} attempt {failure['attempts']} failed for {metadata.get('title')}, "
+                f"retrying after {failure['next_eligible_at']}"
+            )
+
+    load.save_ep_manifest(metadata, m_path)
+
+
+def record_failure_from_disk(m_path, stage, error):
+    """For the supervisor, which only holds the manifest path of a crashed worker's episode"""
+    try:
+        with open(m_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        record_failure(metadata, m_path, stage, error)
+    except Exception as err:
+        with log_context(episode_id=Path(m_path).stem, stage=stage):
+            logger.error(f"Failed to record failure for {m_path}: {err}")
+
+
+def clear_failure(metadata, stage):
+    """Drops a stage's failure record after it succeeds, saved with the caller's manifest update"""
+    failures = metadata.get("failures")
+    if failures and stage in failures:
+        del failures[stage]
+        if not failures:
+            del metadata["failures"]
+
+
+### Quarantine management ###
+
+def list_quarantined(manifest_folder):
+    """Returns (manifest_path, metadata, stage) for every quarantined episode stage"""
+    quarantined = []
+    for m_path in sorted(manifest_folder.glob("*.json")):
+        try:
+            with open(m_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        except Exception as err:
+            logger.error(f"Error reading manifest {m_path.name}: {err}")
+            continue
+
+        for stage, failure in (metadata.get("failures") or {}).items():
+            if failure.get("quarantined"):
+                quarantined.append((m_path, metadata, stage))
+
+    return quarantined
+
+
+def release(manifest_folder, episode_id=None, stage=None):
+    """Clears quarantine (and the attempt count) so the next run retries; None matches everything"""
+    released = 0
+    for m_path, metadata, q_stage in list_quarantined(manifest_folder):
+        if episode_id and metadata.get("episode_id") != episode_id:
+            continue
+        if stage and q_stage != stage:
+            continue
+
+        clear_failure(metadata, q_stage)
+        load.save_ep_manifest(metadata, m_path)
+        logger.info(f"Released {metadata.get('title')} from quarantine at {q_stage}")
+        released += 1
+
+    return released
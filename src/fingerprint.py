@@ -0,0 +1,399 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src import config, load
+from src.logger import init_logger
+logger = init_logger(__name__)
+
+# Recurring-segment detection (intros, outros, repeated ad reads) by spectral hashing.
+# Every 12 ms hop of ~5.3 kHz audio gets a 32-bit sub-fingerprint from the signs of band energy
+# differences across 33 bands between 300 Hz and 2 kHz (Haitsma & Kalker). Identical audio gives
+# identical hashes at a constant frame offset, so repeated segments show up as runs of exact
+# hash matches sharing one offset. Everything is vectorised, an hour of audio takes a few seconds
+# on one core, against minutes of GPU time for transcription and diarization of the same hour.
+
+INPUT_SAMPLE_RATE = 16000
+DECIMATION = 3                  # 16 kHz -> 5.33 kHz, enough for the 2 kHz top band
+FP_SAMPLE_RATE = INPUT_SAMPLE_RATE / DECIMATION
+FRAME = 1024                    # 192 ms analysis window
+HOP = 64                        # 12 ms between sub-fingerprints
+HOP_S = HOP / FP_SAMPLE_RATE
+N_BANDS = 33
+LOWPASS_TAPS = 63
+BLOCK_FRAMES = 8192             # Frames per FFT batch, bounds memory on long recordings
+MAX_HITS_PER_HASH = 4           # Hashes more common than this in a reference carry no position info
+SEGMENTS_FILE = "segments.json"
+
+
+### Fingerprinting ###
+
+def _band_bins():
+    edges = np.geomspace(300, 2000, N_BANDS + 1)
+    return np.round(edges * FRAME / FP_SAMPLE_RATE).astype(int)
+
+
+def _lowpass_kernel():
+    # Windowed-sinc low-pass at 2.4 kHz, under the 2.67 kHz Nyquist of the decimated signal
+    cutoff = 2400 / INPUT_SAMPLE_RATE
+    n = np.arange(LOWPASS_TAPS) - (LOWPASS_TAPS - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(LOWPASS_TAPS)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def decimate(audio):
+    """Low-pass filters and keeps every DECIMATION-th sample, only computing the kept outputs"""
+    if len(audio) < LOWPASS_TAPS:
+        return np.zeros(0, dtype=np.float32)
+
+    kernel = _lowpass_kernel()
+    windows = sliding_window_view(audio.astype(np.float32, copy=False), LOWPASS_TAPS)[::DECIMATION]
+    out = np.empty(len(windows), dtype=np.float32)
+
+    block = BLOCK_FRAMES * HOP
+    for start in range(0, len(windows), block):
+        out[start:start + block] = windows[start:start + block] @ kernel
+
+    return out
+
+
+def compute_fingerprint(audio, sample_rate=INPUT_SAMPLE_RATE):
+    """Returns one uint32 sub-fingerprint per HOP_S of 16 kHz mono float32 audio"""
+    if sample_rate != INPUT_SAMPLE_RATE:
+        raise ValueError(f"Fingerprinting expects {INPUT_SAMPLE_RATE} Hz audio, got {sample_rate}")
+
+    audio = decimate(audio)
+
+    if len(audio) < FRAME + HOP:
+        return np.zeros(0, dtype=np.uint32)
+
+    window = np.hanning(FRAME).astype(np.float32)
+    bins = _band_bins()
+    frames = sliding_window_view(audio, FRAME)[::HOP]
+
+    energies = np.empty((len(frames), N_BANDS), dtype=np.float32)
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        spectrum = np.fft.rfft(frames[start:start + BLOCK_FRAMES] * window, axis=1)[:, bins[0]:bins[-1]]
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        # Band sums as differences of a running sum over the 300 Hz - 2 kHz bins
+        cumulative = np.concatenate([np.zeros((len(power), 1), dtype=power.dtype), np.cumsum(power, axis=1)], axis=1)
+        energies[start:start + len(power)] = cumulative[:, bins[1:] - bins[0]] - cumulative[:, bins[:-1] - bins[0]]
+
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+
+    return np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+
+
+### Matching ###
+
+def find_repeated_runs(query, reference, min_frames, max_gap_frames, min_hits):
+    """
+    Finds runs where query and reference share exact sub-fingerprints at a constant offset.
+    Returns a list of (query_start, query_end, reference_start) frame indices, with no two runs
+    overlapping in the query.
+    """
+    if not len(query) or not len(reference):
+        return []
+
+    order = np.argsort(reference, kind="stable")
+    sorted_ref = reference[order]
+    lo = np.searchsorted(sorted_ref, query, side="left")
+    counts = np.searchsorted(sorted_ref, query, side="right") - lo
+
+    # Silence and flat spectra hash to the same few values, drop them as uninformative
+    usable = (counts > 0) & (counts <= MAX_HITS_PER_HASH) & (query != 0) & (query != 0xFFFFFFFF)
+    if not usable.any():
+        return []
+
+    counts = counts[usable]
+    q_idx = np.repeat(np.nonzero(usable)[0], counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    r_idx = order[np.repeat(lo[usable], counts) + within]
+    offsets = r_idx - q_idx
+
+    # Votes per offset, pooled with the neighbouring offsets to allow a frame of alignment jitter
+    candidates, votes = np.unique(offsets, return_counts=True)
+    pooled = votes.copy()
+    for shift in (-1, 1):
+        neighbour = np.searchsorted(candidates, candidates + shift)
+        found = neighbour < len(candidates)
+        found[found] &= candidates[neighbour[found]] == candidates[found] + shift
+        pooled[found] += votes[neighbour[found]]
+
+    runs = []
+    taken = np.zeros(len(q_idx), dtype=bool)
+
+    for offset in candidates[pooled >= min_hits][np.argsort(-pooled[pooled >= min_hits])]:
+        hits = ~taken & (np.abs(offsets - offset) <= 1)
+        if hits.sum() < min_hits:
+            continue
+
+        hit_frames = np.sort(q_idx[hits])
+        breaks = np.nonzero(np.diff(hit_frames) > max_gap_frames)[0]
+        for run in np.split(hit_frames, breaks + 1):
+            if len(run) >= min_hits and run[-1] - run[0] >= min_frames:
+                runs.append((int(run[0]), int(run[-1]), int(offset)))
+                # Chance matches at other offsets inside an accepted run are the same repeat
+                taken |= (q_idx >= run[0]) & (q_idx <= run[-1])
+        taken |= hits
+
+    return _merge_runs(runs)
+
+
+def _merge_runs(runs):
+    """
+    Merges (query_start, query_end, offset) runs that overlap in the query into
+    (query_start, query_end, reference_start), aligned by the offset of the longest run merged.
+    """
+    merged = []
+    for start, end, offset in sorted(runs):
+        if merged and start <= merged[-1][1]:
+            m_start, m_end, m_offset, m_length = merged[-1]
+            if end - start > m_length:
+                m_offset, m_length = offset, end - start
+            merged[-1] = [m_start, max(m_end, end), m_offset, m_length]
+        else:
+            merged.append([start, end, offset, end - start])
+
+    return [(start, end, max(start + offset, 0)) for start, end, offset, _ in merged]
+
+
+def _frames(seconds):
+    return int(round(seconds / HOP_S))
+
+
+def _seconds(frames):
+    return round(frames * HOP_S, 2)
+
+
+### Per-feed index ###
+
+def feed_id_for(metadata):
+    """Episodes ingested before feed_id was recorded belong to the configured feed"""
+    return metadata.get("feed_id") or hashlib.md5((config.RSS_URL or "").encode()).hexdigest()[:12]
+
+
+def load_segments(feed_folder):
+    path = feed_folder / SEGMENTS_FILE
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["segments"]
+
+
+def save_segments(feed_folder, segments):
+    load.save_to_json(feed_folder / SEGMENTS_FILE, {"segments": segments})
+
+
+def save_fingerprint(feed_folder, episode_id, fp):
+    # Write then rename like load.save_to_json: a truncated file would be the newest reference
+    path = feed_folder / f"{episode_id}.npy"
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, fp)
+    os.replace(tmp_path, path)
+
+
+def load_fingerprint(feed_folder, episode_id):
+    """Returns None, with a warning, for a fingerprint that can't be read"""
+    try:
+        return np.load(feed_folder / f"{episode_id}.npy")
+    except Exception as err:
+        logger.warning(f"Skipping unreadable fingerprint of {episode_id}: {err}")
+        return None
+
+
+def index_episode(audio, episode_id, feed_folder, settings, sample_rate=INPUT_SAMPLE_RATE):
+    """
+    Fingerprints an episode, saves it into the feed index and returns the repeated spans found:
+    first against known segments, then against the most recent reference episodes, registering
+    any newly discovered repeats as segments owned by the reference episode.
+    settings: reference_episodes, min_segment_s, max_gap_s, min_hits
+    """
+    feed_folder.mkdir(parents=True, exist_ok=True)
+    query = compute_fingerprint(audio, sample_rate)
+
+    min_frames = _frames(settings["min_segment_s"])
+    max_gap = _frames(settings["max_gap_s"])
+    min_hits = settings["min_hits"]
+
+    segments = load_segments(feed_folder)
+    known = {segment["segment_id"]: segment for segment in segments}
+    fingerprints = {}
+    spans = []
+    unmatched = query.copy()
+
+    def reference_fp(owner_id):
+        if owner_id not in fingerprints:
+            fingerprints[owner_id] = load_fingerprint(feed_folder, owner_id)
+        return fingerprints[owner_id]
+
+    ### 1. Known segments ###
+    for segment in segments:
+        if segment["owner_episode_id"] == episode_id:
+            continue
+
+        owner_fp = reference_fp(segment["owner_episode_id"])
+        if owner_fp is None:
+            continue
+        seg_start, seg_end = _frames(segment["owner_start"]), _frames(segment["owner_end"])
+        runs = find_repeated_runs(unmatched, owner_fp[seg_start:seg_end], min_frames, max_gap, min_hits)
+
+        for q_start, q_end, r_start in runs:
+            spans.append(_span(segment, q_start, q_end, seg_start + r_start))
+            unmatched[q_start:q_end + 1] = 0
+        if runs and episode_id not in segment["occurrences"]:
+            segment["occurrences"].append(episode_id)
+
+    ### 2. Discover new repeats against recent episodes ###
+    references = sorted(
+        (path for path in feed_folder.glob("*.npy") if path.stem != episode_id),
+        key=lambda path: path.stat().st_mtime, reverse=True
+    )[:settings["reference_episodes"]]
+
+    for ref_path in references:
+        ref_fp = reference_fp(ref_path.stem)
+        if ref_fp is None:
+            continue
+        runs = find_repeated_runs(unmatched, ref_fp, min_frames, max_gap, min_hits)
+
+        for q_start, q_end, r_start in runs:
+            segment_id = f"{ref_path.stem}_{r_start}"
+            segment = known.get(segment_id)
+            # Registered before but not matched in step 1, must not be added twice
+            if segment:
+                if episode_id not in segment["occurrences"]:
+                    segment["occurrences"].append(episode_id)
+            else:
+                segment = {
+                    "segment_id": segment_id,
+                    "owner_episode_id": ref_path.stem,
+                    "owner_start": _seconds(r_start),
+                    "owner_end": _seconds(r_start + q_end - q_start),
+                    "occurrences": [ref_path.stem, episode_id],
+                }
+                segments.append(segment)
+                known[segment_id] = segment
+                logger.info(
+                    f"New repeated segment: {segment['owner_end'] - segment['owner_start']:.1f}s "
+                    f"shared with episode {ref_path.stem}"
+                )
+            spans.append(_span(segment, q_start, q_end, r_start))
+            unmatched[q_start:q_end + 1] = 0
+
+    save_fingerprint(feed_folder, episode_id, query)
+    save_segments(feed_folder, segments)
+
+    return sorted(spans, key=lambda span: span["start"])
+
+
+def _span(segment, q_start, q_end, r_start):
+    return {
+        "segment_id": segment["segment_id"],
+        "start": _seconds(q_start),
+        "end": _seconds(q_end),
+        "owner_episode_id": segment["owner_episode_id"],
+        "owner_start": _seconds(r_start),
+    }
+
+
+### Reusing stored results for repeated spans ###
+
+def reusable_spans(metadata, complete_key, manifest_folder):
+    """
+    Repeated spans whose owner episode already has complete_key set, paired with the owner's
+    manifest. Spans whose owner hasn't been processed yet are left for the model.
+    """
+    reusable = []
+    owners = {}
+
+    for span in metadata.get("repeated_spans") or []:
+        owner_id = span["owner_episode_id"]
+        if owner_id not in owners:
+            try:
+                with open(Path(manifest_folder) / f"{owner_id}.json", "r", encoding="utf-8") as f:
+                    owners[owner_id] = json.load(f)
+            except Exception as err:
+                logger.warning(f"Cannot reuse span from {owner_id}: {err}")
+                owners[owner_id] = {}
+
+        if owners[owner_id].get(complete_key):
+            reusable.append((span, owners[owner_id]))
+
+    return reusable
+
+
+def reuse_transcript_chunks(transcription_result, reusable):
+    """Adds the owner's words for each reused span to a transcription result, keeping its schema"""
+    chunks = list(transcription_result["chunks"])
+    transcripts = {}
+
+    for span, owner in reusable:
+        path = owner["transcript_path_full"]
+        if path not in transcripts:
+            with open(path, "r", encoding="utf-8") as f:
+                transcripts[path] = json.load(f)["chunks"]
+
+        shift = span["start"] - span["owner_start"]
+        owner_end = span["owner_start"] + span["end"] - span["start"]
+
+        for chunk in transcripts[path]:
+            words = [
+                {"word": word["word"], "start": round(word["start"] + shift, 2), "end": round(word["end"] + shift, 2)}
+                for word in chunk["words"] if span["owner_start"] <= word["start"] < owner_end
+            ]
+            if not words:
+                continue
+
+            if len(words) == len(chunk["words"]):
+                text = chunk["text"]
+                timestamp = [round(chunk["timestamp"][0] + shift, 2), round(chunk["timestamp"][1] + shift, 2)]
+            else:
+                text = "".join(word["word"] for word in words)
+                timestamp = [words[0]["start"], words[-1]["end"]]
+            chunks.append({"text": text, "timestamp": timestamp, "words": words})
+
+    chunks.sort(key=lambda chunk: chunk["timestamp"][0])
+    return {"text": "".join(chunk["text"] + " " for chunk in chunks), "chunks": chunks}
+
+
+def reuse_diarization_turns(diarization, reusable):
+    """
+    Adds the owner's speaker turns for each reused span, tagged with the episode they came from.
+    Anonymous labels only mean something within one episode, so reused turns are labelled
+    "<source_episode_id>:<label>" and keep the bare label as source_speaker for relabelling.
+    """
+    turns = list(diarization)
+    diarizations = {}
+
+    for span, owner in reusable:
+        path = owner["diarization_path"]
+        if path not in diarizations:
+            with open(path, "r", encoding="utf-8") as f:
+                diarizations[path] = json.load(f)
+
+        shift = span["start"] - span["owner_start"]
+        owner_end = span["owner_start"] + span["end"] - span["start"]
+
+        for turn in diarizations[path]:
+            start, end = max(turn["start"], span["owner_start"]), min(turn["end"], owner_end)
+            if end <= start:
+                continue
+            # Turns the owner itself reused keep their original source
+            source_id = turn.get("source_episode_id", owner["episode_id"])
+            source_speaker = turn.get("source_speaker", turn["speaker"])
+            turns.append({
+                "start": round(start + shift, 3),
+                "end": round(end + shift, 3),
+                "speaker": f"{source_id}:{source_speaker}",
+                "source_episode_id": source_id,
+                "source_speaker": source_speaker,
+            })
+
+    turns.sort(key=lambda turn: turn["start"])
+    return turns
@@ -1,4 +1,7 @@
 import json
+import os
+import subprocess
+import tempfile
 
 from src.logger import init_logger
 logger = init_logger(__name__)
@@ -6,13 +9,84 @@ logger = init_logger(__name__)
 ### Save episode to disk functions ###
 
 def save_ep_audio_stream(audio_stream, save_path):
+    """Returns True once the whole download is on disk, a partial file is removed"""
     try:
         with open(save_path, "wb") as f:
             for chunk in audio_stream.iter_content(chunk_size=8192):
                 f.write(chunk)
         logger.info(f"Saved audio to {save_path}")
+        return True
     except Exception as err:
         logger.error(f"Failed to save audio: {err}")
+        if os.path.exists(save_path):
+            os.remove(save_path)
+        return False
+
+
+def save_ep_audio_stream_tee(audio_stream, save_path, converted_path, ffmpeg_command):
+    """
+    Tee-style ingestion: writes the MP3 to disk while piping the same bytes into an ffmpeg
+    process reading from stdin, so the conversion finishes together with the download.
+    Returns (downloaded, converted). If ffmpeg fails the MP3 download still completes and the
+    partial output is removed, so the processing stage can convert it later. If the download
+    fails both partial files are removed.
+    """
+    ffmpeg_ok = True
+    downloaded = False
+
+    with tempfile.TemporaryFile() as ffmpeg_log:
+        try:
+            # stderr goes to a file rather than a pipe so a chatty ffmpeg can never block the download
+            ffmpeg = subprocess.Popen(
+                ffmpeg_command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=ffmpeg_log
+            )
+        except FileNotFoundError:
+            logger.error("FFmpeg is not installed or not in your PATH.")
+            ffmpeg = None
+            ffmpeg_ok = False
+
+        try:
+            with open(save_path, "wb") as f:
+                for chunk in audio_stream.iter_content(chunk_size=8192):
+                    f.write(chunk)
+
+                    if ffmpeg_ok:
+                        try:
+                            ffmpeg.stdin.write(chunk)
+                        except OSError as err:
+                            logger.warning(f"FFmpeg stopped accepting audio, finishing MP3 download only: {err}")
+                            ffmpeg_ok = False
+            logger.info(f"Saved audio to {save_path}")
+            downloaded = True
+        except Exception as err:
+            logger.error(f"Failed to save audio: {err}")
+            ffmpeg_ok = False
+            if ffmpeg:
+                ffmpeg.kill()
+
+        if ffmpeg:
+            try:
+                ffmpeg.stdin.close()
+            except OSError:
+                pass
+            ffmpeg.wait()
+
+            if ffmpeg.returncode != 0:
+                ffmpeg_log.seek(0)
+                stderr = ffmpeg_log.read().decode("utf-8", errors="replace")
+                logger.error(f"FFmpeg Error: {stderr}")
+                ffmpeg_ok = False
+
+    if not downloaded and os.path.exists(save_path):
+        os.remove(save_path)
+
+    if not ffmpeg_ok:
+        if os.path.exists(converted_path):
+            os.remove(converted_path)
+        return downloaded, False
+
+    logger.info(f"Saved converted audio to {converted_path}")
+    return True, True
         
 
 def save_ep_manifest(manifest_data, save_path):
@@ -67,6 +141,16 @@ def save_diarization(save_path, diarization_data):
         return None
     
     
+def save_speaker_embeddings(save_path, embeddings):
+    try:
+        save_to_json(save_path, embeddings)
+        logger.info(f"Saved speaker embeddings to {save_path}")
+        return True
+    except Exception as err:
+        logger.error(f"Error saving speaker embeddings: {err}")
+        return None
+
+
 def save_aligned_script(save_path, aligned_script):
     try:
         save_to_json(save_path, aligned_script)
@@ -90,7 +174,10 @@ def save_readable_script(save_path, readable_script):
 ### Helper functions ###
 
 def save_to_json(save_path, data):
-    with open(save_path, "w", encoding="utf-8") as f:
+    # Write then rename, so a process killed mid-write never leaves a truncated manifest behind
+    tmp_path = f"{save_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, save_path)
 
         
\ No newline at end of file
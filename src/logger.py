@@ -1,18 +1,182 @@
+import atexit
+import contextlib
+import contextvars
+import datetime
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import queue
 import sys
+import threading
 
-def init_logger(name=__name__, level=logging.DEBUG):
+from src import config
+
+# All module loggers share one QueueHandler, so emitting a record is only a queue put and never
+# waits on a slow terminal or pipe. In the parent process a single QueueListener thread drains that
+# queue and does the actual writing. Each worker process gets its own multiprocessing queue
+# (open_worker_log_queue) and attaches to it with configure_worker_logging. A relay thread moves the
+# worker's records onto the parent's queue, so every record still goes through the one listener.
+# The supervisor kills workers mid-episode, and a process killed while writing to a Queue can leave
+# it locked or corrupt. Per-worker queues confine that damage to the queue being thrown away.
+
+_log_context = contextvars.ContextVar("log_context", default={})
+
+_queue_handler = None
+_output_handler = None
+_listener = None
+
+
+### Per-episode correlation ###
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Tags every record logged inside the block with the given fields, e.g. episode_id and stage"""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        context = _log_context.get()
+        for field in ("episode_id", "stage"):
+            if getattr(record, field, None) is None:
+                setattr(record, field, context.get(field))
+        return True
+
+
+### Formatters ###
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "stage": getattr(record, "stage", None),
+            "episode_id": getattr(record, "episode_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        context = [
+            f"{field}={getattr(record, field)}"
+            for field in ("stage", "episode_id") if getattr(record, field, None)
+        ]
+        return f"{line} [{' '.join(context)}]" if context else line
+
+
+def build_formatter(log_format):
+    if log_format == "json":
+        return JsonFormatter()
+    return TextFormatter("%(asctime)s - %(name)s - %(levelname)s --- %(message)s")
+
+
+### Setup ###
+
+def _get_queue_handler():
+    global _queue_handler, _output_handler, _listener
+
+    if _queue_handler is not None:
+        return _queue_handler
+
+    # The handler writes to an in-process queue. Child processes buffer there until
+    # configure_worker_logging points it at their worker queue.
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(ContextFilter())
+
+    if multiprocessing.parent_process() is None:
+        _output_handler = logging.StreamHandler(sys.stdout)
+        _output_handler.setFormatter(build_formatter(config.LOG_FORMAT))
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, _output_handler)
+        _listener.start()
+        atexit.register(stop_logging)
+
+    return _queue_handler
+
+
+def init_logger(name=__name__, level=None):
     logger = logging.getLogger(name)
 
     if not logger.handlers:
-        logger.setLevel(level)
+        logger.setLevel(level or config.LOG_LEVEL)
+        logger.addHandler(_get_queue_handler())
+
+    return logger
+
+
+### Worker queues ###
+
+def open_worker_log_queue():
+    """
+    Returns (log_queue, relay) for one worker process. Pass log_queue to the worker and hand both
+    to close_worker_log_queue once the worker has exited.
+    """
+    handler = _get_queue_handler()
+    # Workers are always spawned, whatever the default start method is
+    log_queue = multiprocessing.get_context("spawn").Queue()
+    relay = threading.Thread(target=_relay_records, args=(log_queue, handler), name="log-relay", daemon=True)
+    relay.start()
+    return log_queue, relay
+
+
+def _relay_records(log_queue, handler):
+    while True:
+        try:
+            record = log_queue.get()
+        except Exception:
+            # Half-written by a killed worker, nothing after it can be trusted
+            return
+        if record is None:
+            return
+        handler.handle(record)
+
+
+def close_worker_log_queue(log_queue, relay, timeout_s=5):
+    """
+    Drains and drops a retired worker's queue. A relay stuck on a record the worker was killed
+    while writing is abandoned with its queue rather than waited on.
+    """
+    try:
+        log_queue.put(None)
+    except Exception:
+        pass
+    relay.join(timeout_s)
+    log_queue.close()
+    log_queue.cancel_join_thread()
+
+
+def configure_worker_logging(log_queue):
+    """Call first thing in a worker process to route its records to its queue from open_worker_log_queue"""
+    handler = _get_queue_handler()
+    buffered = handler.queue
+    handler.queue = log_queue
+
+    # Forward anything logged while the child was importing modules
+    while True:
+        try:
+            log_queue.put_nowait(buffered.get_nowait())
+        except queue.Empty:
+            break
 
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(level)
 
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s --- %(message)s")
-        handler.setFormatter(formatter)
+def stop_logging():
+    """Flushes and stops the listener, registered to run at interpreter exit"""
+    global _listener
 
-        logger.addHandler(handler)
+    if _listener is not None:
+        _listener.stop()
 
-    return logger
\ No newline at end of file
+    _listener = None
@@ -0,0 +1,141 @@
+import json
+
+import numpy as np
+
+from src import load
+from src.logger import init_logger
+logger = init_logger(__name__)
+
+# Persistent speaker identities across episodes. Diarization caches one embedding per anonymous
+# label (SPEAKER_00, ...) for each episode. Alignment matches those against the stored identity
+# centroids with a cosine-similarity matrix, so the same host gets the same identity every week.
+# Unmatched speakers are enrolled as new identities, which can be given a name later. Relabelling
+# only needs the cached embeddings, never another diarization run.
+#
+# Store layout: {"speakers": [{"speaker_id": "speaker_001", "name": "Todd McGowan",
+#                              "centroid": [...], "episodes": ["<episode_id>", ...]}]}
+
+STORE_FILE = "speaker_store.json"
+
+
+### Store ###
+
+def load_store(store_folder):
+    path = store_folder / STORE_FILE
+    if not path.exists():
+        return {"speakers": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_store(store_folder, store):
+    load.save_to_json(store_folder / STORE_FILE, store)
+
+
+def display_name(speaker):
+    return speaker.get("name") or speaker["speaker_id"]
+
+
+def _normalise(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+### Matching ###
+
+def identify_speakers(episode_id, embeddings, store, threshold, auto_enroll=True):
+    """
+    Maps an episode's anonymous labels to speaker_ids. embeddings is {label: vector}.
+    Pairs are assigned one-to-one in order of cosine similarity, above threshold. Matched centroids
+    are updated with the episode's embedding (once per episode) and unmatched labels are enrolled.
+    Returns {label: speaker_id}, or None for labels left anonymous.
+    """
+    labels = [label for label, vector in embeddings.items() if vector is not None and np.all(np.isfinite(vector))]
+    if not labels:
+        return {}
+
+    vectors = _normalise(np.array([embeddings[label] for label in labels], dtype=np.float32))
+    speakers = store["speakers"]
+    assignments = {}
+
+    if speakers:
+        centroids = _normalise(np.array([speaker["centroid"] for speaker in speakers], dtype=np.float32))
+        similarity = vectors @ centroids.T
+
+        # Greedy one-to-one assignment, best pairs first: two labels in the same episode are
+        # different people by construction, so they must not share an identity
+        order = np.dstack(np.unravel_index(np.argsort(-similarity, axis=None), similarity.shape))[0]
+        used = set()
+        for label_idx, speaker_idx in order:
+            if similarity[label_idx, speaker_idx] < threshold:
+                break
+            if labels[label_idx] in assignments or speaker_idx in used:
+                continue
+            assignments[labels[label_idx]] = int(speaker_idx)
+            used.add(speaker_idx)
+
+    identities = {}
+    for label_idx, label in enumerate(labels):
+        if label in assignments:
+            speaker = speakers[assignments[label]]
+            _update_centroid(speaker, episode_id, vectors[label_idx])
+        elif auto_enroll:
+            speaker = {
+                "speaker_id": f"speaker_{len(speakers) + 1:03d}",
+                "name": None,
+                "centroid": vectors[label_idx].tolist(),
+                "episodes": [episode_id],
+            }
+            speakers.append(speaker)
+            logger.info(f"Enrolled new speaker {speaker['speaker_id']} from {label}")
+        else:
+            identities[label] = None
+            continue
+
+        identities[label] = speaker["speaker_id"]
+
+    return identities
+
+
+def _update_centroid(speaker, episode_id, vector):
+    if episode_id in speaker["episodes"]:
+        return
+
+    # Running mean of unit vectors, weighted by the number of episodes already folded in
+    count = len(speaker["episodes"])
+    centroid = np.array(speaker["centroid"], dtype=np.float32)
+    speaker["centroid"] = ((centroid * count + vector) / (count + 1)).tolist()
+    speaker["episodes"].append(episode_id)
+
+
+### Relabelling ###
+
+def relabel_turns(diarization, identities, store, source_identities=None):
+    """
+    Replaces anonymous labels in diarization turns with identity names. Turns reused from another
+    episode (source_episode_id) map their source_speaker with that episode's identities from
+    source_identities, and keep their namespaced label while that episode has none.
+    """
+    names = {speaker["speaker_id"]: display_name(speaker) for speaker in store["speakers"]}
+    source_identities = source_identities or {}
+
+    relabelled = []
+    for turn in diarization:
+        mapping, label, fallback = identities, turn["speaker"], turn["speaker"]
+        if turn.get("source_episode_id"):
+            mapping = source_identities.get(turn["source_episode_id"]) or {}
+            label = turn.get("source_speaker", label)
+            fallback = f"{turn['source_episode_id']}:{label}"
+
+        speaker_id = mapping.get(label)
+        relabelled.append({**turn, "speaker": names.get(speaker_id, fallback)})
+
+    return relabelled
+
+
+def rename_speaker(store, speaker_id, name):
+    for speaker in store["speakers"]:
+        if speaker["speaker_id"] == speaker_id:
+            speaker["name"] = name
+            return True
+    return False
@@ -0,0 +1,292 @@
+import datetime
+import json
+import multiprocessing
+import subprocess
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+import psutil
+
+from src import load, failures
+from src.logger import init_logger, log_context, open_worker_log_queue, close_worker_log_queue
+logger = init_logger(__name__)
+
+# The ML stages run in worker processes that load their model once and then take episodes one
+# at a time from a task queue. The parent samples each worker's RSS (and VRAM through nvidia-smi
+# when a GPU is present) and recycles the worker between episodes after a set number of them or
+# once memory crosses a soft limit. Only the hard limit kills a worker mid-episode. An episode in flight when a worker is killed for memory is requeued, while
+# failures and crashes are recorded against the episode so the backoff in src/failures.py applies.
+# A crash or memory kill only counts against an episode the worker had acknowledged taking; one
+# that dies before that (usually while loading its model) hands the episode back uncharged.
+
+
+MAX_FAILED_STARTS = 3
+
+
+### Worker side (runs in the child process) ###
+
+def serve_episodes(task_queue, result_conn, process_episode):
+    """
+    Worker loop: takes manifest paths from task_queue until it receives None, runs
+    process_episode(m_path, metadata) on each and reports the outcome on result_conn.
+    Each episode is acknowledged with {"accepted": m_path} before work starts, so the parent
+    can tell a crash on that episode from one while the worker was still loading its model.
+    result_conn is a pipe rather than a queue because send() writes before it returns,
+    where a queue's feeder thread would lose both messages if the worker dies hard.
+    """
+    while True:
+        m_path = task_queue.get()
+        if m_path is None:
+            break
+
+        result_conn.send({"accepted": m_path})
+        m_path = Path(m_path)
+        started = time.monotonic()
+        ok, error = False, None
+
+        try:
+            with open(m_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+
+            with log_context(episode_id=metadata.get("episode_id")):
+                try:
+                    ok = bool(process_episode(m_path, metadata))
+                except Exception as err:
+                    logger.error(f"Failed to process {metadata.get('title')}: {err}")
+                    error = str(err)
+        except Exception as err:
+            logger.error(f"Error reading manifest {m_path.name}: {err}")
+            error = str(err)
+
+        result_conn.send({
+            "manifest_path": str(m_path),
+            "ok": ok,
+            "error": error,
+            "duration_s": round(time.monotonic() - started, 2),
+        })
+
+
+### Memory sampling (runs in the parent) ###
+
+def sample_rss_mb(pid):
+    try:
+        return psutil.Process(pid).memory_info().rss / 2**20
+    except psutil.Error:
+        return None
+
+
+def sample_vram_mb(pid):
+    """Per-process GPU memory from nvidia-smi, which also sees ctranslate2 allocations torch can't"""
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", "--query-compute-apps=pid,used_memory", "--format=csv,noheader,nounits"],
+            capture_output=True, text=True, timeout=10, check=True
+        )
+    except (FileNotFoundError, subprocess.SubprocessError):
+        return None
+
+    for line in result.stdout.splitlines():
+        fields = [field.strip() for field in line.split(",")]
+        if len(fields) == 2 and fields[0] == str(pid):
+            return float(fields[1])
+    return None
+
+
+### Supervisor (runs in the parent) ###
+
+def run_supervised_stage(stage_name, todo, ready, worker_target, settings, report_folder):
+    """
+    Runs worker_target(task_queue, result_conn, log_queue) in recycled child processes until
+    every manifest in todo has been handed out. ready(metadata) is re-checked before each dispatch
+    so a requeued episode that actually finished is not processed twice.
+    settings: max_episodes_per_worker, recycle_rss_mb, max_rss_mb, recycle_vram_mb, max_vram_mb,
+              sample_interval_s, max_requeues
+    Returns the per-worker report, which is also saved as JSON in report_folder.
+    """
+    pending = deque(m_path for m_path, _ in todo)
+    requeues = Counter()
+    workers = []
+    failed_starts = 0
+
+    while pending:
+        report = _run_worker(stage_name, len(workers) + 1, pending, requeues, ready, worker_target, settings)
+        workers.append(report)
+
+        # A worker that dies before finishing anything is likely failing to load its model
+        failed_starts = 0 if report["episodes"] else failed_starts + 1
+        if failed_starts >= MAX_FAILED_STARTS:
+            logger.error(f"{stage_name}: {failed_starts} workers in a row died without finishing an episode, stopping stage")
+            break
+
+    if workers:
+        _save_report(stage_name, workers, report_folder)
+
+    return workers
+
+
+def _run_worker(stage_name, worker_number, pending, requeues, ready, worker_target, settings):
+    task_queue = multiprocessing.Queue()
+    result_conn, worker_result_conn = multiprocessing.Pipe(duplex=False)
+    # Each worker logs through its own queue, so killing it can't wedge logging for the next one
+    log_queue, log_relay = open_worker_log_queue()
+    process = multiprocessing.Process(
+        target=worker_target,
+        args=(task_queue, worker_result_conn, log_queue),
+        name=f"{stage_name}-worker-{worker_number}"
+    )
+    process.start()
+    logger.info(f"Started {process.name} (pid {process.pid})")
+
+    started = time.monotonic()
+    report = {"worker": process.name, "pid": process.pid, "episodes": [], "samples": [], "recycle_reason": None}
+    in_flight = None
+    accepted = killed = False
+    rss_mb = vram_mb = None
+
+    while True:
+        if in_flight is None:
+            reason = _recycle_reason(report, rss_mb, vram_mb, settings)
+            if reason or not pending:
+                report["recycle_reason"] = reason or "no work left"
+                break
+
+            m_path = pending.popleft()
+            if not _still_ready(m_path, ready):
+                continue
+
+            in_flight, accepted = m_path, False
+            task_queue.put(str(m_path))
+
+        result = result_conn.recv() if result_conn.poll(settings["sample_interval_s"]) else None
+
+        rss_mb = sample_rss_mb(process.pid)
+        vram_mb = sample_vram_mb(process.pid)
+        if rss_mb is not None:
+            report["samples"].append([round(time.monotonic() - started, 1), round(rss_mb), vram_mb])
+
+        # Parent-side events about the episode carry its episode_id like the worker's own records
+        with _episode_context(in_flight):
+            if result and "accepted" in result:
+                accepted = True
+            elif result:
+                report["episodes"].append(result)
+                if not result["ok"]:
+                    failures.record_failure_from_disk(in_flight, stage_name, result["error"] or f"{stage_name} did not save its output")
+                in_flight = None
+                continue
+
+            if not process.is_alive():
+                # Handle whatever the worker sent before it died first
+                if result_conn.poll():
+                    continue
+                logger.error(f"{process.name} crashed (Code {process.exitcode})")
+                if accepted:
+                    failures.record_failure_from_disk(in_flight, stage_name, f"Worker crashed (Code {process.exitcode})")
+                # Died before taking the episode (e.g. OOM loading the model): not the episode's fault
+                elif in_flight is not None:
+                    pending.appendleft(in_flight)
+                report["recycle_reason"] = f"crashed (Code {process.exitcode})"
+                in_flight = None
+                break
+
+            # Mid-episode breach: kill now rather than let the worker take the machine down
+            reason = _memory_breach(rss_mb, vram_mb, settings)
+            if reason:
+                logger.warning(f"{process.name} exceeded {reason} mid-episode, terminating and requeueing")
+                process.kill()
+                killed = True
+                if accepted:
+                    _requeue(in_flight, stage_name, pending, requeues, settings)
+                # Over the limit before taking the episode, i.e. the model load alone
+                elif in_flight is not None:
+                    pending.appendleft(in_flight)
+                report["recycle_reason"] = f"{reason} (killed)"
+                in_flight = None
+                break
+
+    _stop_worker(process, task_queue, killed)
+    result_conn.close()
+    worker_result_conn.close()
+    close_worker_log_queue(log_queue, log_relay)
+    report["exit_code"] = process.exitcode
+    report["peak_rss_mb"] = max((sample[1] for sample in report["samples"]), default=None)
+    logger.info(
+        f"{process.name} retired after {len(report['episodes'])} episodes "
+        f"(peak RSS {report['peak_rss_mb']} MB): {report['recycle_reason']}"
+    )
+    return report
+
+
+def _recycle_reason(report, rss_mb, vram_mb, settings):
+    if len(report["episodes"]) >= settings["max_episodes_per_worker"]:
+        return f"reached {settings['max_episodes_per_worker']} episodes"
+    # The soft limits, below the hard ones, so a slow leak is usually caught between episodes
+    # instead of by a kill that throws the episode's work away
+    soft = _memory_breach(rss_mb, vram_mb, settings, prefix="recycle_")
+    return f"soft {soft}" if soft else _memory_breach(rss_mb, vram_mb, settings)
+
+
+def _memory_breach(rss_mb, vram_mb, settings, prefix="max_"):
+    rss_limit, vram_limit = settings.get(f"{prefix}rss_mb"), settings.get(f"{prefix}vram_mb")
+    if rss_limit and rss_mb is not None and rss_mb > rss_limit:
+        return f"RSS limit ({rss_mb:.0f} > {rss_limit} MB)"
+    if vram_limit and vram_mb is not None and vram_mb > vram_limit:
+        return f"VRAM limit ({vram_mb:.0f} > {vram_limit} MB)"
+    return None
+
+
+def _episode_context(m_path):
+    """Manifests are named after their episode_id"""
+    return log_context(episode_id=Path(m_path).stem if m_path else None)
+
+
+def _still_ready(m_path, ready):
+    try:
+        with open(m_path, "r", encoding="utf-8") as f:
+            return ready(json.load(f))
+    except Exception as err:
+        logger.error(f"Error reading manifest {Path(m_path).name}: {err}")
+        return False
+
+
+def _requeue(m_path, stage_name, pending, requeues, settings):
+    if m_path is None:
+        return
+
+    requeues[m_path] += 1
+    if requeues[m_path] > settings["max_requeues"]:
+        logger.error(f"Giving up on {Path(m_path).name} after {requeues[m_path]} interrupted attempts")
+        # Recorded so backoff and quarantine apply, instead of retrying it in full every run
+        failures.record_failure_from_disk(
+            m_path, stage_name, f"Killed for memory {requeues[m_path]} times in a row"
+        )
+        return
+
+    pending.appendleft(m_path)
+
+
+def _stop_worker(process, task_queue, killed=False, timeout_s=60):
+    # Killed by the supervisor itself: the -9 exit is expected, not a teardown crash
+    if not killed and process.is_alive():
+        task_queue.put(None)
+        process.join(timeout_s)
+
+        if process.is_alive():
+            logger.warning(f"{process.name} did not exit cleanly, killing it")
+            process.kill()
+        # Non-zero exits here are the known ctranslate2 teardown crash, work is already saved
+        elif process.exitcode != 0:
+            logger.warning(f"{process.name} exited with code {process.exitcode} during shutdown")
+
+    process.join()
+
+
+def _save_report(stage_name, workers, report_folder):
+    timestamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    report_path = Path(report_folder) / f"{stage_name}_workers_{timestamp}.json"
+    try:
+        load.save_to_json(report_path, {"stage": stage_name, "workers": workers})
+        logger.info(f"Saved worker memory report to {report_path}")
+    except Exception as err:
+        logger.error(f"Failed to save worker memory report: {err}")
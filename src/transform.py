@@ -1,7 +1,8 @@
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import torch
-import torchaudio
 from faster_whisper import WhisperModel
 
 from pyannote.audio import Pipeline
@@ -10,23 +11,16 @@ from pyannote.audio.pipelines.utils.hook import ProgressHook
 import os
 from dotenv import load_dotenv
 
+from src.audio import build_ffmpeg_command, load_audio
 from src.logger import init_logger
 logger = init_logger(__name__)
 
 
 
-### Convert audio files from mp3 to AI optimised wav format using ffmpeg and subprocess ###
+### Convert audio files from mp3 to the AI optimised intermediate format using ffmpeg and subprocess ###
 
-def convert_to_wav_ffmpeg(input_path: str, output_path: str):
-    command = [
-        "ffmpeg",
-        "-y",               # Overwrite output file if it exists
-        "-i", input_path,
-        "-ar", "16000",     # Audio rate
-        "-ac", "1",         # Audio channels (Mono)
-        "-c:a", "pcm_s16le",# Codec: 16-bit PCM
-        output_path
-    ]
+def convert_audio_ffmpeg(input_path: str, output_path: str, audio_format="wav"):
+    command = build_ffmpeg_command(input_path, output_path, audio_format)
 
     try:
         result = subprocess.run(command, capture_output=True, text=True, check=True)
@@ -40,55 +34,181 @@ def convert_to_wav_ffmpeg(input_path: str, output_path: str):
         return False
     
 
-def init_faster_whisper(model_size="large-v3-turbo"):
+def init_faster_whisper(model_size="large-v3-turbo", num_workers=1):
     
-    model = WhisperModel(model_size, device="cuda", compute_type="float16")
+    # num_workers > 1 lets several transcribe calls run concurrently on one loaded model
+    model = WhisperModel(model_size, device="cuda", compute_type="float16", num_workers=num_workers)
 
     return model
-    
 
-def run_whisper_pipeline(model, audio_path):
-    style_prompt = (
+
+WHISPER_SAMPLE_RATE = 16000
+
+WHISPER_STYLE_PROMPT = (
     "Hello and thank you for joining us on Why Theory. I am Ryan Engley, "
     "joined by Todd McGowan. In this episode, we explore the work of "
     "Lacan, Marx, Althusser, Benjamin, and Freud, specifically looking at "
     "the symbolic, the imaginary, and the real."
-    )
+)
+
+
+def transcribe_segments(model, audio):
+    """Runs whisper on a path or 16k mono float32 array and returns the materialised segment list"""
+    if not isinstance(audio, str) and len(audio) == 0:
+        # Everything was cut out (e.g. a rerun episode made only of known segments)
+        return []
+
     segments, info = model.transcribe(
-        str(audio_path), 
+        audio, 
         beam_size=5, 
         word_timestamps=True,
         language="en",
-        initial_prompt=style_prompt,
+        initial_prompt=WHISPER_STYLE_PROMPT,
         vad_filter=True,
         vad_parameters=dict(min_silence_duration_ms=500)
     )
 
-    segments = list(segments)
+    # Segments are a lazy generator, decoding only happens while iterating
+    return list(segments)
+
+
+def segment_to_chunk(segment, offset=0.0, keep_start=None, keep_end=None):
+    """
+    Converts a whisper segment into the transcript chunk schema, shifting timestamps by offset.
+    Timestamps are rounded to 2 decimals in every path, so chunked and plain runs store the same values.
+    When keep_start/keep_end are given, only words starting inside [keep_start, keep_end) are kept.
+    Returns None if no words survive.
+    """
+    words = [
+        {"word": word.word, "start": round(word.start + offset, 2), "end": round(word.end + offset, 2)}
+        for word in (segment.words or [])
+    ]
+    start, end = round(segment.start + offset, 2), round(segment.end + offset, 2)
+
+    if keep_start is None and keep_end is None:
+        return {"text": segment.text, "timestamp": [start, end], "words": words}
 
+    keep_start = float("-inf") if keep_start is None else keep_start
+    keep_end = float("inf") if keep_end is None else keep_end
+
+    if not words:
+        # No word timings, so the segment midpoint decides which chunk owns it
+        if keep_start <= (start + end) / 2 < keep_end:
+            return {"text": segment.text, "timestamp": [start, end], "words": []}
+        return None
+
+    kept = [word for word in words if keep_start <= word["start"] < keep_end]
+    if not kept:
+        return None
+
+    if len(kept) == len(words):
+        text = segment.text
+        timestamp = [start, end]
+    else:
+        text = "".join(word["word"] for word in kept)
+        timestamp = [kept[0]["start"], kept[-1]["end"]]
+
+    return {"text": text, "timestamp": timestamp, "words": kept}
+
+
+def chunks_to_output(chunks):
     output = {"text": "", "chunks": []}
 
-    for segment in segments:
-        output["text"] += segment.text + " "
-        
-        chunk = {
-            "text": segment.text,
-            "timestamp": [segment.start, segment.end],
-            "words": []
-        }
-        
-        if segment.words:
-            for word in segment.words:
-                chunk["words"].append({
-                    "word": word.word,
-                    "start": word.start,
-                    "end": word.end
-                })
-        
+    for chunk in chunks:
+        output["text"] += chunk["text"] + " "
         output["chunks"].append(chunk)
 
     return output
 
+
+def run_whisper_pipeline(model, audio_handle, skip_spans=None):
+    audio = load_audio(audio_handle)
+    timeline = None
+    if skip_spans:
+        audio, timeline = remove_spans(audio, WHISPER_SAMPLE_RATE, skip_spans)
+
+    segments = transcribe_segments(model, audio)
+
+    return chunks_to_output(restore_chunk(segment_to_chunk(segment), timeline) for segment in segments)
+
+
+### Split-and-stitch transcription for long recordings ###
+
+def find_chunk_boundaries(audio, sample_rate, chunk_length_s, overlap_s, search_window_s=30, frame_ms=50):
+    """
+    Plans overlapping chunks for a long recording, cutting at the quietest frame near each
+    chunk_length_s target so cuts land in pauses rather than mid-word.
+    Returns a list of dicts with the audio range to decode ('start', 'end') and the range
+    whose words the chunk owns when stitching ('keep_start', 'keep_end'), all in seconds.
+    """
+    total_s = len(audio) / sample_rate
+    search_window_s = min(search_window_s, chunk_length_s / 4)
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+
+    # RMS energy per frame, computed in one pass over the whole recording
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+
+    cuts = [0.0]
+    while total_s - cuts[-1] > chunk_length_s + search_window_s:
+        target = cuts[-1] + chunk_length_s
+        lo = int((target - search_window_s) * 1000 / frame_ms)
+        hi = int((target + search_window_s) * 1000 / frame_ms)
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        cuts.append((quietest + 0.5) * frame_ms / 1000)
+    cuts.append(total_s)
+
+    half_overlap = overlap_s / 2
+    plan = []
+    for keep_start, keep_end in zip(cuts[:-1], cuts[1:]):
+        plan.append({
+            "start": max(0.0, keep_start - half_overlap),
+            "end": min(total_s, keep_end + half_overlap),
+            "keep_start": keep_start,
+            "keep_end": keep_end,
+        })
+
+    return plan
+
+
+def run_whisper_pipeline_chunked(model, audio_handle, min_duration_s, chunk_length_s, overlap_s, workers, skip_spans=None):
+    """
+    Transcribes a long recording as overlapping chunks in parallel and stitches the segments
+    back together. Each word is kept only by the chunk whose cut range contains its start, which
+    removes the duplicates in the overlap regions. Output matches run_whisper_pipeline.
+    """
+    audio = load_audio(audio_handle)
+    timeline = None
+    if skip_spans:
+        audio, timeline = remove_spans(audio, WHISPER_SAMPLE_RATE, skip_spans)
+    duration_s = len(audio) / WHISPER_SAMPLE_RATE
+
+    if duration_s < min_duration_s:
+        segments = transcribe_segments(model, audio)
+        return chunks_to_output(restore_chunk(segment_to_chunk(segment), timeline) for segment in segments)
+
+    plan = find_chunk_boundaries(audio, WHISPER_SAMPLE_RATE, chunk_length_s, overlap_s)
+    logger.info(f"Splitting {duration_s / 60:.1f} min recording into {len(plan)} chunks across {workers} workers")
+
+    def transcribe_chunk(chunk):
+        start = int(chunk["start"] * WHISPER_SAMPLE_RATE)
+        end = int(chunk["end"] * WHISPER_SAMPLE_RATE)
+        return transcribe_segments(model, audio[start:end])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunk_segments = list(executor.map(transcribe_chunk, plan))
+
+    stitched = []
+    for chunk, segments in zip(plan, chunk_segments):
+        for segment in segments:
+            converted = segment_to_chunk(segment, chunk["start"], chunk["keep_start"], chunk["keep_end"])
+            if converted:
+                stitched.append(restore_chunk(converted, timeline))
+
+    return chunks_to_output(stitched)
+
+
 def init_pyannote():
 
     load_dotenv()
@@ -103,9 +223,21 @@ def init_pyannote():
 
     return pipeline
 
-def run_pyannote(pipeline, audio_path):
+def run_pyannote(pipeline, audio_handle, skip_spans=None, return_embeddings=False):
+    """
+    Returns the list of speaker turns, plus {label: embedding} for each anonymous label when
+    return_embeddings is set (used to match speakers across episodes without re-running the model)
+    """
 
-    waveform, sample_rate = torchaudio.load(audio_path)
+    samples = load_audio(audio_handle)
+    sample_rate = WHISPER_SAMPLE_RATE
+    timeline = None
+    if skip_spans:
+        samples, timeline = remove_spans(samples, sample_rate, skip_spans)
+        if len(samples) == 0:
+            return ([], {}) if return_embeddings else []
+    # pyannote takes a (channel, time) tensor
+    waveform = torch.from_numpy(np.ascontiguousarray(samples)).unsqueeze(0)
     audio_in_memory = {"waveform": waveform, "sample_rate": sample_rate}
 
     result = pipeline(audio_in_memory)
@@ -114,14 +246,83 @@ def run_pyannote(pipeline, audio_path):
    
     diarization_list = []
     for turn, _, speaker in annotation.itertracks(yield_label=True):
-        diarization_list.append({
-            "start": round(turn.start, 3),
-            "end": round(turn.end, 3),
-            "speaker": speaker
-        })
+        # A turn may straddle a removed span, in which case it maps back to several pieces
+        pieces = restore_span(turn.start, turn.end, timeline) if timeline else [(turn.start, turn.end)]
+        for start, end in pieces:
+            diarization_list.append({
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "speaker": speaker
+            })
+
+    if not return_embeddings:
+        return diarization_list
+
+    # Embedding rows follow the order of the annotation's labels
+    embeddings = {}
+    if result.speaker_embeddings is not None:
+        for index, speaker in enumerate(annotation.labels()):
+            embeddings[speaker] = result.speaker_embeddings[index].tolist()
     
-    return diarization_list
+    return diarization_list, embeddings
+
+
 
+### Excluding spans (e.g. known jingles) from model input ###
+
+def remove_spans(audio, sample_rate, spans):
+    """
+    Cuts (start, end) spans in seconds out of the last axis of audio. Returns the remaining audio
+    and a timeline of (cut_start, original_start, duration) pieces for mapping times back.
+    """
+    pieces, timeline = [], []
+    cursor, cut_position = 0, 0
+    total = audio.shape[-1]
+
+    for start, end in sorted(spans) + [(total / sample_rate, total / sample_rate)]:
+        start_sample = min(total, int(round(start * sample_rate)))
+        if start_sample > cursor:
+            pieces.append(audio[..., cursor:start_sample])
+            timeline.append((cut_position / sample_rate, cursor / sample_rate, (start_sample - cursor) / sample_rate))
+            cut_position += start_sample - cursor
+        cursor = max(cursor, int(round(end * sample_rate)))
+
+    if not pieces:
+        return audio[..., :0], [(0.0, 0.0, 0.0)]
+
+    return np.concatenate(pieces, axis=-1), timeline
+
+
+def restore_time(t, timeline):
+    """Maps a time on the cut audio back to the original recording"""
+    for cut_start, original_start, duration in reversed(timeline):
+        if t >= cut_start:
+            return original_start + min(t - cut_start, duration)
+    return t
+
+
+def restore_span(start, end, timeline):
+    """Maps a [start, end) range on the cut audio back to one or more original ranges"""
+    pieces = []
+    for cut_start, original_start, duration in timeline:
+        overlap_start, overlap_end = max(start, cut_start), min(end, cut_start + duration)
+        if overlap_end > overlap_start:
+            pieces.append((original_start + overlap_start - cut_start, original_start + overlap_end - cut_start))
+    return pieces
+
+
+def restore_chunk(chunk, timeline):
+    if not timeline:
+        return chunk
+
+    return {
+        "text": chunk["text"],
+        "timestamp": [round(restore_time(t, timeline), 2) for t in chunk["timestamp"]],
+        "words": [
+            {"word": word["word"], "start": round(restore_time(word["start"], timeline), 2), "end": round(restore_time(word["end"], timeline), 2)}
+            for word in chunk["words"]
+        ]
+    }
 
 
 def merge_transcript_and_diarization(transcript_chunks, diarization_segments):
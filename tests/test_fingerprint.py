@@ -0,0 +1,138 @@
+import json
+
+import numpy as np
+import pytest
+
+from src import fingerprint
+
+SETTINGS = {"reference_episodes": 5, "min_segment_s": 5, "max_gap_s": 1, "min_hits": 50}
+
+
+def _hashes(rng, count):
+    return rng.integers(1, 2**32 - 1, size=count, dtype=np.uint32)
+
+
+def _overlaps(runs):
+    return any(start <= previous_end for (_, previous_end, _), (start, _, _) in zip(runs, runs[1:]))
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def test_finds_a_repeat_at_its_offset(rng):
+    reference = _hashes(rng, 6000)
+    query = _hashes(rng, 6000)
+    query[3000:4000] = reference[1000:2000]
+
+    runs = fingerprint.find_repeated_runs(query, reference, min_frames=400, max_gap_frames=80, min_hits=50)
+
+    assert runs == [(3000, 3999, 1000)]
+
+
+def test_no_repeat_gives_no_runs(rng):
+    runs = fingerprint.find_repeated_runs(_hashes(rng, 4000), _hashes(rng, 4000), 400, 80, 50)
+    assert runs == []
+
+
+def test_chance_matches_inside_a_run_do_not_add_a_second_run(rng):
+    # Part of the repeated block also occurs elsewhere in the reference, at another offset
+    reference = _hashes(rng, 8000)
+    reference[5000:5500] = reference[1200:1700]
+    query = _hashes(rng, 6000)
+    query[3000:4000] = reference[1000:2000]
+
+    runs = fingerprint.find_repeated_runs(query, reference, min_frames=400, max_gap_frames=80, min_hits=50)
+
+    assert runs == [(3000, 3999, 1000)]
+
+
+def test_block_repeated_in_the_reference_gives_one_run(rng):
+    # Both reference copies match the whole query block, at two offsets
+    reference = _hashes(rng, 8000)
+    reference[5000:6000] = reference[1000:2000]
+    query = _hashes(rng, 6000)
+    query[3000:4000] = reference[1000:2000]
+
+    runs = fingerprint.find_repeated_runs(query, reference, min_frames=400, max_gap_frames=80, min_hits=50)
+
+    assert len(runs) == 1 and runs[0][:2] == (3000, 3999)
+    assert not _overlaps(runs)
+
+
+def test_merge_keeps_the_longest_runs_alignment():
+    runs = fingerprint._merge_runs([(100, 600, 50), (500, 1500, -400), (2000, 2500, 10)])
+    assert runs == [(100, 1500, 0), (2000, 2500, 2010)]
+
+
+def test_index_does_not_register_a_segment_twice(rng, tmp_path, monkeypatch):
+    reference = _hashes(rng, 6000)
+    query = _hashes(rng, 6000)
+    query[3000:4000] = reference[1000:2000]
+    np.save(tmp_path / "ref.npy", reference)
+
+    # Known segment whose stored range is too short to match in step 1, but with the same id
+    # step 2 derives from the full reference
+    stale = {"segment_id": "ref_1000", "owner_episode_id": "ref", "owner_start": 12.0,
+             "owner_end": 13.0, "occurrences": ["ref"]}
+    fingerprint.save_segments(tmp_path, [stale])
+    monkeypatch.setattr(fingerprint, "compute_fingerprint", lambda audio, sample_rate: query)
+
+    spans = fingerprint.index_episode(np.zeros(1), "new", tmp_path, SETTINGS)
+
+    segments = fingerprint.load_segments(tmp_path)
+    assert [segment["segment_id"] for segment in segments] == ["ref_1000"]
+    assert segments[0]["occurrences"] == ["ref", "new"]
+    assert [span["segment_id"] for span in spans] == ["ref_1000"]
+
+
+def test_index_finds_the_shared_jingle_once_per_episode(tmp_path):
+    from harness import feed_server
+
+    for number in (1, 2, 4):
+        samples = feed_server.generate_episode(7, number, 40).astype(np.float32) / 32767
+        spans = fingerprint.index_episode(samples, f"ep{number}", tmp_path, SETTINGS)
+        if number > 1:
+            assert len(spans) == 1 and spans[0]["start"] < 1
+
+    with open(tmp_path / fingerprint.SEGMENTS_FILE, "r", encoding="utf-8") as f:
+        segment_ids = [segment["segment_id"] for segment in json.load(f)["segments"]]
+    assert len(segment_ids) == len(set(segment_ids)) == 1
+
+
+def test_reused_turns_do_not_share_labels_with_the_episode(tmp_path):
+    from src import speakers
+
+    owner_path = tmp_path / "owner_diarization.json"
+    owner_path.write_text(json.dumps([{"start": 0.0, "end": 8.0, "speaker": "SPEAKER_00"}]))
+    owner = {"episode_id": "owner", "diarization_path": str(owner_path)}
+    span = {"start": 100.0, "end": 108.0, "owner_start": 0.0}
+    own_turns = [{"start": 10.0, "end": 20.0, "speaker": "SPEAKER_00"}]
+
+    turns = fingerprint.reuse_diarization_turns(own_turns, [(span, owner)])
+    assert [turn["speaker"] for turn in turns] == ["SPEAKER_00", "owner:SPEAKER_00"]
+
+    store = {"speakers": [{"speaker_id": "speaker_001", "name": "Host"}, {"speaker_id": "speaker_002", "name": None}]}
+    # Owner not aligned yet: the reused turn keeps its namespaced label
+    relabelled = speakers.relabel_turns(turns, {"SPEAKER_00": "speaker_002"}, store)
+    assert [turn["speaker"] for turn in relabelled] == ["speaker_002", "owner:SPEAKER_00"]
+
+    relabelled = speakers.relabel_turns(turns, {"SPEAKER_00": "speaker_002"}, store, {"owner": {"SPEAKER_00": "speaker_001"}})
+    assert [turn["speaker"] for turn in relabelled] == ["speaker_002", "Host"]
+
+
+def test_truncated_reference_is_skipped(rng, tmp_path, monkeypatch):
+    reference = _hashes(rng, 6000)
+    query = _hashes(rng, 6000)
+    query[3000:4000] = reference[1000:2000]
+    fingerprint.save_fingerprint(tmp_path, "ref", reference)
+    # What a kill mid-write used to leave behind, with the newest mtime
+    with open(tmp_path / "ref.npy", "rb") as f:
+        (tmp_path / "broken.npy").write_bytes(f.read()[:1000])
+    monkeypatch.setattr(fingerprint, "compute_fingerprint", lambda audio, sample_rate: query)
+
+    spans = fingerprint.index_episode(np.zeros(1), "new", tmp_path, SETTINGS)
+
+    assert [span["segment_id"] for span in spans] == ["ref_1000"]
+    assert not list(tmp_path.glob("*.tmp"))